@@ -1,40 +1,72 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import sys
 
 RARITIES = ["Common", "Rare", "Epic", "Legendary"]
 CARD_TYPES = ["General", "Minion", "Spell", "Artifact"]
 MAIN_FACTIONS: List[str] = ["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar",]
 ALL_FACTIONS: List[str] = ["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar", "Neutral"]
+FACTIONS_DICT: Dict[int, str] = {
+    1: "Lyonar",
+    2: "Songhai",
+    3: "Vetruvian",
+    4: "Abyssian",
+    5: "Magmar",
+    6: "Vanar",
+    100: "Neutral",
+}
+
+# small int codes of the categorical fields, so cards can be filtered by comparing ints - the faction codes are the ones of the API
+FACTION_CODES: Dict[str, int] = {faction: faction_int for faction_int, faction in FACTIONS_DICT.items()}
+ALL_RARITIES: List[str] = ["Basic", "Common", "Rare", "Epic", "Legendary", "Mythron", "Token"]
+RARITY_CODES: Dict[str, int] = {rarity: rarity_code for rarity_code, rarity in enumerate(ALL_RARITIES)}
+CARD_TYPE_CODES: Dict[str, int] = {card_type: card_type_code for card_type_code, card_type in enumerate(CARD_TYPES)}
+UNKNOWN_CODE = -1
+NEUTRAL_FACTION_CODE = FACTION_CODES["Neutral"]
+GENERAL_CARD_TYPE_CODE = CARD_TYPE_CODES["General"]
+MINION_CARD_TYPE_CODE = CARD_TYPE_CODES["Minion"]
+# rarities, which can be added to a deck
+DECK_RARITY_CODES = frozenset(RARITY_CODES[rarity] for rarity in RARITIES)
+# rarities of the collectible cards
+COLLECTIBLE_RARITY_CODES = frozenset(RARITY_CODES[rarity] for rarity in RARITIES + ["Mythron"])
+
+# name, id, card_set, faction, rarity, mana, attack, health, card_type
+CardSnapshotRow = Tuple[str, int, str, str, str, int, Optional[int], Optional[int], str]
 
 class CardData:
+    # no per card __dict__ - the categorical strings are interned and additionally stored as int codes
+    __slots__ = ("name", "id", "card_set", "faction", "rarity", "mana", "attack", "health", "card_type", "faction_code", "rarity_code", "card_type_code")
+
     def __init__(self, card: Dict) -> None:
         self.name: str = card["name"]
         self.id: int = card["id"]
-        self.card_set: str = card["cardSet"]
+        self.card_set: str = sys.intern(card["cardSet"])
         self.faction: str = get_faction_str_from_faction_int(faction_int=card["faction"])
-        self.rarity: str = card["rarity"]
-        self.description: str = card["description"]
-        self.related_cards: List[int] = card["relatedCards"]
-        self.gifs: List[str] = card["resource"]
+        self.rarity: str = sys.intern(card["rarity"])
         self.mana: int = card["mana"]
         self.attack: Optional[int] = card.get("attack")
         self.health: Optional[int] = card.get("health")
-        self.card_type: str = card["cardType"]
-        self.tribes: List[str] = card["tribes"]
+        self.card_type: str = sys.intern(card["cardType"])
+        self._set_codes()
+
+    def _set_codes(self) -> None:
+        self.faction_code: int = FACTION_CODES[self.faction]
+        self.rarity_code: int = RARITY_CODES.get(self.rarity, UNKNOWN_CODE)
+        self.card_type_code: int = CARD_TYPE_CODES.get(self.card_type, UNKNOWN_CODE)
+
+    def to_snapshot_row(self) -> CardSnapshotRow:
+        return (self.name, self.id, self.card_set, self.faction, self.rarity, self.mana, self.attack, self.health, self.card_type)
+
+    @classmethod
+    def from_snapshot_row(cls, row: CardSnapshotRow) -> "CardData":
+        card = cls.__new__(cls)
+        card.name, card.id, card.card_set, card.faction, card.rarity, card.mana, card.attack, card.health, card.card_type = row
+        card._set_codes()
+        return card
 
 def get_faction_str_from_faction_int(faction_int: int) -> str:
-    FACTIONS_DICT: Dict[int, str] = {
-        1: "Lyonar",
-        2: "Songhai",
-        3: "Vetruvian",
-        4: "Abyssian",
-        5: "Magmar",
-        6: "Vanar",
-        100: "Neutral",
-    }
     if faction_int not in FACTIONS_DICT.keys():
         raise ValueError(
             f"The given faction_int {faction_int} is not in FACTIONS_DICT keys {FACTIONS_DICT.keys()}"
         )
     else:
         return FACTIONS_DICT[faction_int]
-    
\ No newline at end of file
@@ -0,0 +1,118 @@
+from typing import Dict, Literal, Optional
+import datetime
+import json
+import os
+import threading
+import requests
+
+DUELYST_API = "https://api.duelyst2.com/"
+CARD_DATA_CACHE_DIRECTORY = "card_data_cache/"
+API_TIMEOUT_SECONDS = 5.0
+# a cached file, that was revalidated within this time, is used without asking the API again
+CARD_DATA_MAX_AGE = datetime.timedelta(hours=1)
+
+
+class CardDataCache:
+    '''On-disk cache of a card json file from the Duelyst API
+
+    The cached file (or the bundled file, if nothing is cached yet) is returned right away and revalidated with
+    ETag / Last-Modified in a background thread (stale-while-revalidate), so a new version is used from the next start on.
+    With revalidation="blocking" the revalidation is awaited, but never longer than the timeout.
+    '''
+    def __init__(
+        self,
+        json_file_name: str,
+        api_url: str = DUELYST_API,
+        cache_directory: str = CARD_DATA_CACHE_DIRECTORY,
+        timeout: float = API_TIMEOUT_SECONDS,
+        max_age: datetime.timedelta = CARD_DATA_MAX_AGE,
+        revalidation: Literal["background", "blocking", "never"] = "background",
+    ) -> None:
+        self.json_file_name = json_file_name
+        self.url = f"{api_url}{json_file_name}"
+        self.cache_path = os.path.join(cache_directory, json_file_name)
+        self.metadata_path = f"{self.cache_path}.metadata.json"
+        self.timeout = timeout
+        self.max_age = max_age
+        self.revalidation = revalidation
+        self.revalidation_thread: Optional[threading.Thread] = None
+        # "cache" or "bundled file" - set by locate
+        self.source: str = ""
+
+    def load(self) -> str:
+        '''returns the card json, revalidation is started according to the revalidation mode'''
+        with open(self.locate(), encoding="UTF-8") as f:
+            return f.read()
+
+    def locate(self) -> str:
+        '''returns the path of the card json, revalidation is started according to the revalidation mode'''
+        if self.revalidation != "never" and self._is_stale():
+            self.revalidation_thread = threading.Thread(target=self.revalidate, name=f"revalidate {self.json_file_name}", daemon=True)
+            self.revalidation_thread.start()
+            if self.revalidation == "blocking":
+                self.revalidation_thread.join(timeout=self.timeout)
+        if os.path.exists(self.cache_path):
+            self.source = "cache"
+            return self.cache_path
+        self.source = "bundled file"
+        return self.json_file_name
+
+    def revalidate(self) -> bool:
+        '''conditional request to the API, returns True, if a new version was cached'''
+        metadata = self._read_metadata()
+        headers: Dict[str, str] = {}
+        if os.path.exists(self.cache_path):
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last_modified"):
+                headers["If-Modified-Since"] = metadata["last_modified"]
+        try:
+            r = requests.get(self.url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Revalidation of {self.json_file_name} failed: {e}")
+            return False
+        if r.status_code == 304:
+            metadata["revalidated_at"] = datetime.datetime.now().isoformat()
+            self._write_metadata(metadata)
+            return False
+        if r.status_code != 200:
+            print(f"Revalidation of {self.json_file_name} failed with status code {r.status_code}")
+            return False
+        try:
+            cards_json = json.loads(r.text)
+        except ValueError as e:
+            print(f"Revalidation of {self.json_file_name} returned invalid json: {e}")
+            return False
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        # write to a temporary file and replace, so a reader never sees a half written file
+        temporary_path = f"{self.cache_path}.tmp"
+        with open(temporary_path, "w", encoding="UTF-8") as f:
+            f.write(r.text)
+        os.replace(temporary_path, self.cache_path)
+        self._write_metadata({
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "revalidated_at": datetime.datetime.now().isoformat(),
+        })
+        print(f"Cached {len(cards_json)} cards of {self.json_file_name} from the API")
+        return True
+
+    def _is_stale(self) -> bool:
+        revalidated_at = self._read_metadata().get("revalidated_at")
+        if not os.path.exists(self.cache_path) or not revalidated_at:
+            return True
+        return datetime.datetime.now() - datetime.datetime.fromisoformat(revalidated_at) > self.max_age
+
+    def _read_metadata(self) -> Dict[str, Optional[str]]:
+        try:
+            with open(self.metadata_path, encoding="UTF-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_metadata(self, metadata: Dict[str, Optional[str]]) -> None:
+        os.makedirs(os.path.dirname(self.metadata_path) or ".", exist_ok=True)
+        temporary_path = f"{self.metadata_path}.tmp"
+        with open(temporary_path, "w", encoding="UTF-8") as f:
+            json.dump(metadata, f)
+        os.replace(temporary_path, self.metadata_path)
@@ -1,12 +1,24 @@
-from typing import List, Dict, DefaultDict, Literal
-from CardData import CardData
-import requests
-import json
+from typing import List, Dict, DefaultDict, Literal, Tuple
+from CardData import CardData, COLLECTIBLE_RARITY_CODES, GENERAL_CARD_TYPE_CODE
+from CardDataCache import CardDataCache
+from CardPoolSnapshot import CardPoolSnapshot
 from collections import defaultdict
+import numpy as np
+
+# columns of the collectible cards - attack and health are -1 for cards without them
+COLLECTIBLE_CARD_COLUMNS_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("faction", np.int16),
+    ("rarity", np.int8),
+    ("card_type", np.int8),
+    ("mana", np.int16),
+    ("attack", np.int16),
+    ("health", np.int16),
+])
 
 
 class CardPool:
-    def __init__(self, legacy: bool) -> None:
+    def __init__(self, legacy: bool, revalidation: Literal["background", "blocking", "never"] = "background") -> None:
         '''init card pool'''
         if legacy:
             print("Initializing Legacy CardPool")
@@ -19,39 +31,24 @@ class CardPool:
         self.collectible_cards: List[CardData] = []
         self.collectible_cards_by_faction: DefaultDict[Literal["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar", "Neutral"], List[CardData]] = defaultdict(lambda: [])
 
-        # get all cards, legacy / new
-        DUELYST_API = "https://api.duelyst2.com/"
+        # get all cards, legacy / new - from the local cache, which is revalidated against the API in the background
         CARDS_JSON = "cards.json"
         LEGACY_CARDS_JSON = "legacy-cards.json"
-        if legacy:
-            r = requests.get(f"{DUELYST_API}{LEGACY_CARDS_JSON}")
-        else:
-            r = requests.get(f"{DUELYST_API}{CARDS_JSON}")
-        if r.status_code == 200:
-            all_cards_json: List[Dict] = json.loads(r.text)
-            print(f"Retrieved {len(all_cards_json)} cards from the API")
-        else:
-            if legacy:
-                with open(LEGACY_CARDS_JSON, encoding="UTF-8") as f:
-                    cards_json = f.read()
-                    all_cards_json: List[Dict] = json.loads(cards_json)
-            else:
-                with open(CARDS_JSON, encoding="UTF-8") as f:
-                    cards_json = f.read()
-                    all_cards_json: List[Dict] = json.loads(cards_json)
-            print(f"API Request failed, using local cards.json file, which includes {len(all_cards_json)} cards")
-        for card in all_cards_json:
-            self.all_cards.append(CardData(card))
+        card_data_cache = CardDataCache(json_file_name=LEGACY_CARDS_JSON if legacy else CARDS_JSON, revalidation=revalidation)
+        # the parsed cards are kept in a snapshot, which is only rebuilt, if the json changes
+        card_pool_snapshot = CardPoolSnapshot(source_path=card_data_cache.locate(), snapshot_path=f"{card_data_cache.cache_path}.snapshot.pickle")
+        self.all_cards = card_pool_snapshot.load()
+        print(f"Loaded {len(self.all_cards)} cards from the {card_data_cache.source} ({card_pool_snapshot.source})")
         print(f"CardPool initialized with {len(self.all_cards)} total cards")
 
         # categorize cards
         for card in self.all_cards:
             # Gauntlet cards, that can't be used normally
             if card.card_set != "Gauntlet Specials":
-                if card.card_type == "General":
+                if card.card_type_code == GENERAL_CARD_TYPE_CODE:
                     self.generals.append(card)
                     self.generals_by_faction[card.faction].append(card)
-                if card.rarity in ["Common", "Rare", "Epic", "Legendary", "Mythron"]:
+                if card.rarity_code in COLLECTIBLE_RARITY_CODES:
                     self.collectible_cards.append(card)
                     self.collectible_cards_by_faction[card.faction].append(card)
         print(f"CardPool initialized with {len(self.generals)} generals")
@@ -59,30 +56,60 @@ class CardPool:
         for faction, cards in self.collectible_cards_by_faction.items():
             print(f"CardPool initialized with {len(cards)} cards from faction {faction}")
 
-    def get_card_data_by_card_id(self, card_id: int) -> CardData:
+        # index cards for the lookups - if card names are duplicated the first card wins, like with the former linear search
+        self.cards_by_id: Dict[int, CardData] = {}
         for card in self.all_cards:
-            if card.id == card_id:
-                return card
-        raise ValueError("No card with the card id {card_id} found")
+            self.cards_by_id.setdefault(card.id, card)
+        self.generals_by_name: Dict[str, CardData] = {}
+        for card in self.generals:
+            self.generals_by_name.setdefault(card.name.lower(), card)
+        self.collectible_cards_by_name: Dict[str, CardData] = {}
+        self.collectible_cards_by_faction_and_name: Dict[Tuple[str, str], CardData] = {}
+        self.collectible_card_indices_by_id: Dict[int, int] = {}
+        for index, card in enumerate(self.collectible_cards):
+            self.collectible_card_indices_by_id.setdefault(card.id, index)
+            self.collectible_cards_by_name.setdefault(card.name.lower(), card)
+            self.collectible_cards_by_faction_and_name.setdefault((card.faction, card.name.lower()), card)
+
+        # columnar view of the collectible cards in the order of collectible_cards, so weights can be derived with masks
+        self.collectible_card_columns: np.ndarray = np.array(
+            [
+                (card.id, card.faction_code, card.rarity_code, card.card_type_code, card.mana, -1 if card.attack is None else card.attack, -1 if card.health is None else card.health)
+                for card in self.collectible_cards
+            ],
+            dtype=COLLECTIBLE_CARD_COLUMNS_DTYPE,
+        )
+
+    def get_card_data_by_card_id(self, card_id: int) -> CardData:
+        card = self.cards_by_id.get(card_id)
+        if card is None:
+            raise ValueError(f"No card with the card id {card_id} found")
+        return card
     
     def get_general_by_card_name(self, card_name: str) -> CardData:
-        for card in self.generals:
-            if card_name.lower() == card.name.lower():
-                return card
-        raise ValueError(f"No Card with card name {card_name} found")
+        card = self.generals_by_name.get(card_name.lower())
+        if card is None:
+            raise ValueError(f"No Card with card name {card_name} found")
+        return card
 
     def get_collectible_card_by_card_name(self, card_name: str) -> CardData:
-        for card in self.collectible_cards:
-            if card_name.lower() == card.name.lower():
-                return card
-        raise ValueError(f"No Card with card name {card_name} found")
+        card = self.collectible_cards_by_name.get(card_name.lower())
+        if card is None:
+            raise ValueError(f"No Card with card name {card_name} found")
+        return card
     
     def get_collectible_card_by_card_name_from_faction(self, card_name: str, faction: str) -> CardData:
-        for card in self.collectible_cards_by_faction[faction]:
-            if card_name.lower() == card.name.lower():
-                return card
-        for card in self.collectible_cards_by_faction["Neutral"]:
-            if card_name.lower() == card.name.lower():
-                return card
-        raise ValueError(f"No Card with card name {card_name} found")
-        
\ No newline at end of file
+        card = self.collectible_cards_by_faction_and_name.get((faction, card_name.lower()))
+        if card is None:
+            card = self.collectible_cards_by_faction_and_name.get(("Neutral", card_name.lower()))
+        if card is None:
+            raise ValueError(f"No Card with card name {card_name} found")
+        return card
+
+    def cards_and_weights_from_vector(self, weights: np.ndarray) -> Dict[int, float]:
+        '''card weights dict from a weight vector, that is aligned with collectible_card_columns'''
+        return dict(zip(self.collectible_card_columns["id"].tolist(), weights.tolist()))
+
+    def vector_from_cards_and_weights(self, cards_and_weights: Dict[int, float]) -> np.ndarray:
+        '''weight vector aligned with collectible_card_columns, cards missing in the dict get the weight 0'''
+        return np.array([cards_and_weights.get(card_id, 0.0) for card_id in self.collectible_card_columns["id"].tolist()], dtype=np.float64)
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import os
+import pickle
+from CardData import CardData
+
+# has to be increased, whenever the snapshot rows of CardData change
+CARD_POOL_SNAPSHOT_VERSION = 1
+
+
+class CardPoolSnapshot:
+    '''Pickled snapshot of the CardData rows of a card json, keyed by a content hash of the json
+
+    As long as size and modification time of the json are unchanged, the json isn't even read. Otherwise the json
+    is hashed and only parsed, if its content changed - in both cases the snapshot is rewritten for the next start.
+    '''
+    def __init__(self, source_path: str, snapshot_path: str) -> None:
+        self.source_path = source_path
+        self.snapshot_path = snapshot_path
+        # "snapshot" or "json" - set by load
+        self.source: str = ""
+
+    def load(self) -> List[CardData]:
+        source_stat = os.stat(self.source_path)
+        snapshot = self._read_snapshot()
+        if snapshot is not None and snapshot["source_size"] == source_stat.st_size and snapshot["source_mtime_ns"] == source_stat.st_mtime_ns:
+            self.source = "snapshot"
+            return [CardData.from_snapshot_row(row) for row in snapshot["rows"]]
+        with open(self.source_path, "rb") as f:
+            source = f.read()
+        source_hash = hashlib.blake2b(source).hexdigest()
+        if snapshot is not None and snapshot["source_hash"] == source_hash:
+            self.source = "snapshot"
+            rows = snapshot["rows"]
+            cards = [CardData.from_snapshot_row(row) for row in rows]
+        else:
+            self.source = "json"
+            cards = [CardData(card) for card in json.loads(source)]
+            rows = [card.to_snapshot_row() for card in cards]
+        self._write_snapshot({
+            "version": CARD_POOL_SNAPSHOT_VERSION,
+            "source_hash": source_hash,
+            "source_size": source_stat.st_size,
+            "source_mtime_ns": source_stat.st_mtime_ns,
+            "rows": rows,
+        })
+        return cards
+
+    def _read_snapshot(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != CARD_POOL_SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def _write_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        # write to a temporary file and replace, so a reader never sees a half written snapshot
+        temporary_path = f"{self.snapshot_path}.tmp"
+        with open(temporary_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.snapshot_path)
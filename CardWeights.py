@@ -0,0 +1,80 @@
+from typing import Dict, Iterator, Mapping, Optional
+import numpy as np
+from CardPool import CardPool
+from CardData import FACTION_CODES, RARITY_CODES
+
+
+class CardWeights(Mapping[int, float]):
+    '''Read-only card weights of the collectible cards of a card pool: card_id -> weight
+
+    A preset weight vector (aligned with collectible_card_columns) is shared by all CardWeights derived from it,
+    modifications are only stored as sparse rarity / faction factors on top of it. Deriving the weights of a command
+    therefore costs only as much as its modifications and the full vector is computed once, when a roll needs it.
+    '''
+    def __init__(
+        self,
+        card_pool: CardPool,
+        preset: np.ndarray,
+        rarities_and_factors: Optional[Dict[str, float]] = None,
+        factions_and_factors: Optional[Dict[str, float]] = None,
+    ) -> None:
+        if len(preset) != len(card_pool.collectible_cards):
+            raise ValueError(f"The preset has {len(preset)} weights, but the card pool has {len(card_pool.collectible_cards)} collectible cards")
+        self.card_pool = card_pool
+        if preset.flags.writeable:
+            preset = preset.astype(np.float64)
+            preset.flags.writeable = False
+        self.preset = preset
+        self.rarities_and_factors: Dict[str, float] = dict(rarities_and_factors or {})
+        self.factions_and_factors: Dict[str, float] = dict(factions_and_factors or {})
+        self._rarity_factors_by_code = {RARITY_CODES[rarity]: factor for rarity, factor in self.rarities_and_factors.items()}
+        self._faction_factors_by_code = {FACTION_CODES[faction]: factor for faction, factor in self.factions_and_factors.items()}
+        self._vector: Optional[np.ndarray] = None
+
+    def with_factors(self, rarities_and_factors: Optional[Dict[str, float]] = None, factions_and_factors: Optional[Dict[str, float]] = None) -> "CardWeights":
+        '''new card weights with the given factors multiplied on top of these weights - the preset isn't copied'''
+        combined_rarities_and_factors = dict(self.rarities_and_factors)
+        for rarity, factor in (rarities_and_factors or {}).items():
+            combined_rarities_and_factors[rarity] = combined_rarities_and_factors.get(rarity, 1) * factor
+        combined_factions_and_factors = dict(self.factions_and_factors)
+        for faction, factor in (factions_and_factors or {}).items():
+            combined_factions_and_factors[faction] = combined_factions_and_factors.get(faction, 1) * factor
+        return CardWeights(card_pool=self.card_pool, preset=self.preset, rarities_and_factors=combined_rarities_and_factors, factions_and_factors=combined_factions_and_factors)
+
+    def vector(self) -> np.ndarray:
+        '''read-only weight vector aligned with collectible_card_columns'''
+        if self._vector is None:
+            if not self._rarity_factors_by_code and not self._faction_factors_by_code:
+                self._vector = self.preset
+            else:
+                columns = self.card_pool.collectible_card_columns
+                vector = self.preset.copy()
+                for rarity_code, factor in self._rarity_factors_by_code.items():
+                    vector[columns["rarity"] == rarity_code] *= factor
+                for faction_code, factor in self._faction_factors_by_code.items():
+                    vector[columns["faction"] == faction_code] *= factor
+                vector.flags.writeable = False
+                self._vector = vector
+        return self._vector
+
+    def __getitem__(self, card_id: int) -> float:
+        index = self.card_pool.collectible_card_indices_by_id.get(card_id)
+        if index is None:
+            raise KeyError(card_id)
+        if self._vector is not None:
+            return float(self._vector[index])
+        card = self.card_pool.collectible_cards[index]
+        return float(self.preset[index]) * self._rarity_factors_by_code.get(card.rarity_code, 1) * self._faction_factors_by_code.get(card.faction_code, 1)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.card_pool.collectible_card_indices_by_id)
+
+    def __len__(self) -> int:
+        return len(self.card_pool.collectible_card_indices_by_id)
+
+
+def card_weights_vector(card_pool: CardPool, cards_and_weights: Mapping[int, float]) -> np.ndarray:
+    '''weight vector aligned with collectible_card_columns - without a copy for CardWeights of the same card pool'''
+    if isinstance(cards_and_weights, CardWeights) and cards_and_weights.card_pool is card_pool:
+        return cards_and_weights.vector()
+    return card_pool.vector_from_cards_and_weights(cards_and_weights)
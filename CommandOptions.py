@@ -0,0 +1,159 @@
+from dataclasses import dataclass, field, replace
+from typing import Dict, FrozenSet, List, Literal, Tuple
+import re
+from CardData import RARITIES, MAIN_FACTIONS
+from constants import DECKROLL_MODIFICATION_NOT_GIVEN
+
+MAX_CARD_WEIGHT_CHANGE_FACTOR = 10000
+MAX_FACTION_WEIGHT = 100000
+MAX_CARDS = 100
+
+# one token per whitespace separated word - either a flag (legacy) or a key=value option (cards=60)
+OPTION_TOKEN_REGEX = re.compile(r"(?P<key>[^\s=]+)(?:=(?P<value>\S*))?")
+NUMBER_REGEX = re.compile(r"\d+")
+NUMBERS_REGEX = re.compile(r"\d+(?:/\d+)*")
+
+CARD_WEIGHTS_PRESETS = ["half-faction-half-neutral", "only-faction"]
+FACTION_OPTIONS: Dict[str, str] = {faction.lower(): faction for faction in MAIN_FACTIONS}
+RARITY_OPTIONS: Dict[str, str] = {rarity.lower(): rarity for rarity in RARITIES}
+COMMON_OPTIONS: FrozenSet[str] = frozenset(["legacy", "cards", *CARD_WEIGHTS_PRESETS, *FACTION_OPTIONS, *RARITY_OPTIONS])
+DECKROLL_OPTIONS: FrozenSet[str] = COMMON_OPTIONS | {"count-chances", "count-chances-two-remaining-deck-slots", "min-1-and-2-drops", "max-1-and-2-drops"}
+DRAFT_OPTIONS: FrozenSet[str] = COMMON_OPTIONS | {"faction-offers", "card-offers-per-pick", "cards-to-choose-per-pick", "card-bucket-size"}
+
+
+@dataclass
+class CommandOptions:
+    '''Options of a !deckroll / !draft command - every option, that isn't given in the command, keeps its default'''
+    legacy: bool = False
+    card_weights_preset: Literal["default", "half-faction-half-neutral", "only-faction"] = "default"
+    amount_cards: int = 40
+    factions_and_weights: Dict[str, int] = field(default_factory=dict)
+    # only the given rarities, the factors are multiplied onto the card weights
+    rarities_and_weight_factors: Dict[str, int] = field(default_factory=dict)
+    count_chances: Dict[int, int] = field(default_factory=dict)
+    count_chances_two_remaining_deck_slots: Dict[int, int] = field(default_factory=dict)
+    min_1_and_2_drops: int = DECKROLL_MODIFICATION_NOT_GIVEN
+    max_1_and_2_drops: int = DECKROLL_MODIFICATION_NOT_GIVEN
+    faction_offers: int = 3
+    card_offers_per_pick: int = 3
+    cards_to_choose_per_pick: int = 1
+    card_bucket_size: int = 1
+    # options of the command, that aren't known and therefore got ignored
+    unknown_options: List[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, message_content: str, defaults: "CommandOptions") -> "CommandOptions":
+        '''parses all options of the (lowercase) message in one pass, invalid values raise a ValueError'''
+        tokens = OPTION_TOKEN_REGEX.finditer(message_content)
+        command = next(tokens).group("key")
+        known_options = DRAFT_OPTIONS if command == "!draft" else DECKROLL_OPTIONS
+        # the dicts of the defaults are copied, because e.g. a Draft normalizes its faction weights in place
+        options = replace(
+            defaults,
+            factions_and_weights=dict(defaults.factions_and_weights),
+            rarities_and_weight_factors={},
+            count_chances=dict(defaults.count_chances),
+            count_chances_two_remaining_deck_slots=dict(defaults.count_chances_two_remaining_deck_slots),
+            unknown_options=[],
+        )
+        given_options: Dict[str, str] = {}
+        for token in tokens:
+            key, value = token.group("key", "value")
+            if key not in known_options or (value is None) != (key == "legacy" or key in CARD_WEIGHTS_PRESETS):
+                options.unknown_options.append(token.group())
+            else:
+                given_options[key] = value
+        for key, value in given_options.items():
+            options._set_option(key=key, value=value)
+        options._check_dependent_options()
+        return options
+
+    def deckroll_key(self) -> Tuple:
+        '''hashable key of all options, that change the rolled decks - equal for the same options in any order'''
+        return (
+            self.legacy,
+            self.card_weights_preset,
+            self.amount_cards,
+            tuple(sorted(self.factions_and_weights.items())),
+            tuple(sorted((rarity, factor) for rarity, factor in self.rarities_and_weight_factors.items() if factor != 1)),
+            tuple(sorted(self.count_chances.items())),
+            tuple(sorted(self.count_chances_two_remaining_deck_slots.items())),
+            self.min_1_and_2_drops,
+            self.max_1_and_2_drops,
+        )
+
+    def _set_option(self, key: str, value: str) -> None:
+        if key == "legacy":
+            self.legacy = True
+        elif key in CARD_WEIGHTS_PRESETS:
+            # like before half-faction-half-neutral wins, if both presets are given
+            if self.card_weights_preset != "half-faction-half-neutral":
+                self.card_weights_preset = key
+        elif key == "cards":
+            self.amount_cards = _parse_number(key=key, value=value)
+            if self.amount_cards < 1:
+                raise ValueError(f"detected a given amount of cards of {self.amount_cards}, but the amount of cards can not be less than 1!")
+            if self.amount_cards > MAX_CARDS:
+                raise ValueError(f"detected a given amount of cards of {self.amount_cards}, but the amount of cards can not be greater than {MAX_CARDS}!")
+        elif key in FACTION_OPTIONS:
+            faction_weight_change = _parse_number(key=key, value=value)
+            if faction_weight_change > MAX_FACTION_WEIGHT:
+                raise ValueError(f"detected faction weight change for faction {FACTION_OPTIONS[key]} with the value {faction_weight_change} - only values between 0 and {MAX_FACTION_WEIGHT} are allowed.")
+            self.factions_and_weights[FACTION_OPTIONS[key]] = faction_weight_change
+        elif key in RARITY_OPTIONS:
+            card_weight_change_factor = _parse_number(key=key, value=value)
+            if card_weight_change_factor > MAX_CARD_WEIGHT_CHANGE_FACTOR:
+                raise ValueError(f"detected card weight change for rarity {RARITY_OPTIONS[key]} with the value {card_weight_change_factor} - only values between 0 and {MAX_CARD_WEIGHT_CHANGE_FACTOR} are allowed.")
+            self.rarities_and_weight_factors[RARITY_OPTIONS[key]] = card_weight_change_factor
+        elif key == "count-chances":
+            count_chances = _parse_numbers(key=key, value=value, amount=3)
+            if sum(count_chances) != 100:
+                raise ValueError(f"detected count-chances (1/2/3 ofs) {value} -- the chances must sum up to 100!")
+            self.count_chances = {count: chance for count, chance in enumerate(count_chances, start=1)}
+        elif key == "count-chances-two-remaining-deck-slots":
+            count_chances_two_remaining_deck_slots = _parse_numbers(key=key, value=value, amount=2)
+            if sum(count_chances_two_remaining_deck_slots) != 100:
+                raise ValueError(f"detected count-chances-two-remaining-deck-slots (1/2 ofs) {value} -- the chances must sum up to 100!")
+            self.count_chances_two_remaining_deck_slots = {count: chance for count, chance in enumerate(count_chances_two_remaining_deck_slots, start=1)}
+        elif key == "min-1-and-2-drops":
+            self.min_1_and_2_drops = _parse_number(key=key, value=value)
+        elif key == "max-1-and-2-drops":
+            self.max_1_and_2_drops = _parse_number(key=key, value=value)
+        elif key == "faction-offers":
+            self.faction_offers = _parse_number(key=key, value=value)
+            if self.faction_offers < 1 or self.faction_offers > 6:
+                raise ValueError(f"detected a given amount of faction_offers of {self.faction_offers}, but the amount of region_offers_per_pick has to be between 1 and 6!")
+        elif key == "card-offers-per-pick":
+            self.card_offers_per_pick = _parse_number(key=key, value=value)
+            if self.card_offers_per_pick < 2 or self.card_offers_per_pick > 10:
+                raise ValueError(f"detected a given amount of card_offers_per_pick of {self.card_offers_per_pick}, but the amount of card_offers_per_pick has to be between 2 and 10!")
+        elif key == "cards-to-choose-per-pick":
+            self.cards_to_choose_per_pick = _parse_number(key=key, value=value)
+            if self.cards_to_choose_per_pick < 1 or self.cards_to_choose_per_pick > 9:
+                raise ValueError(f"detected a given amount of card_offers_per_pick of {self.cards_to_choose_per_pick}, but the amount of cards_to_choose_per_pick has to be between 1 and 9!")
+        elif key == "card-bucket-size":
+            self.card_bucket_size = _parse_number(key=key, value=value)
+            if self.card_bucket_size < 1 or self.card_bucket_size > 5:
+                raise ValueError(f"detected a given card_bucket_size of {self.card_bucket_size}, but the card_bucket_size has to be between 1 and 5!")
+
+    def _check_dependent_options(self) -> None:
+        if self.min_1_and_2_drops > self.amount_cards:
+            raise ValueError(f"The given amount of minimum 1 and 2 drops ({self.min_1_and_2_drops}) is higher than the given amount of total cards in the deck ({self.amount_cards})")
+        if self.max_1_and_2_drops != DECKROLL_MODIFICATION_NOT_GIVEN and self.max_1_and_2_drops < self.min_1_and_2_drops:
+            raise ValueError(f"The given amount of minimum 1 and 2 drops ({self.min_1_and_2_drops}) is higher than the given amount of maximum 1 and 2 drops ({self.max_1_and_2_drops})")
+        if self.cards_to_choose_per_pick >= self.card_offers_per_pick:
+            raise ValueError(f"detected a given amount of card_offers_per_pick of {self.cards_to_choose_per_pick} and a given amount of card_offers_per_pick of {self.card_offers_per_pick}, but the amount of cards_to_choose_per_pick has to be smaller than the amount of card_offers_per_pick")
+        if self.card_bucket_size > 1 and self.cards_to_choose_per_pick > 1:
+            raise ValueError("Only one of card_bucket_size and cards_to_choose_per_pick can be greater than 1")
+
+
+def _parse_number(key: str, value: str) -> int:
+    if not NUMBER_REGEX.fullmatch(value):
+        raise ValueError(f"detected {key}={value}, but {key} has to be a whole number!")
+    return int(value)
+
+
+def _parse_numbers(key: str, value: str, amount: int) -> List[int]:
+    if not NUMBERS_REGEX.fullmatch(value) or value.count("/") != amount - 1:
+        raise ValueError(f"detected {key}={value}, but {key} has to be {amount} whole numbers separated by /!")
+    return [int(number) for number in value.split("/")]
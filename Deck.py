@@ -1,7 +1,8 @@
-import base64
-from typing import Literal, Dict, List, DefaultDict
+from typing import Literal, Dict, List, DefaultDict, Optional
 from CardPool import CardPool
-from CardData import CardData, CARD_TYPES
+from DeckCodec import DeckCodec
+from DeckRenderer import DeckRenderer
+from CardData import CardData, CARD_TYPES, DECK_RARITY_CODES, FACTION_CODES, GENERAL_CARD_TYPE_CODE, MINION_CARD_TYPE_CODE, NEUTRAL_FACTION_CODE
 from collections import defaultdict
 import discord
 from constants import DECKLINK_PREFIX, LEGACY_DECKLINK_PREFIX
@@ -12,10 +13,20 @@ class Deck:
         self.max_cards = 40
         self.cards_and_counts: DefaultDict[int, int] = defaultdict(lambda: 0)
         self.faction: Literal["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar"] = None
+        # running totals, which are updated with every added card
+        self._amount_cards = 0
+        self.amount_cards_by_card_type: DefaultDict[str, int] = defaultdict(lambda: 0)
+        self.amount_minions_by_mana: DefaultDict[int, int] = defaultdict(lambda: 0)
+        # cards bucketed by card type and sorted for the deck embed, also updated with every added card
+        self.renderer = DeckRenderer()
 
     @property
     def amount_cards(self) -> int:
-        return sum(list(self.cards_and_counts.values()))
+        return self._amount_cards
+
+    @property
+    def amount_1_and_2_drops(self) -> int:
+        return self.amount_minions_by_mana[0] + self.amount_minions_by_mana[1] + self.amount_minions_by_mana[2]
 
     @property
     def remaining_cards(self) -> int:
@@ -23,72 +34,66 @@ class Deck:
     
     @property
     def deck_sorted_by_card_type(self) -> Dict[str, List[CardData]]:
-        deck_sorted_by_card_type = {}
-        for card_type in CARD_TYPES:
-            deck_sorted_by_card_type[card_type] = []
-        allowed_cards = self.card_pool.generals_by_faction[self.faction] + self.card_pool.collectible_cards_by_faction[self.faction] + self.card_pool.collectible_cards_by_faction["Neutral"]
-        for card_code in self.cards_and_counts.keys():
-            for card in allowed_cards:
-                if card.id == card_code:
-                    deck_sorted_by_card_type[card.card_type].append(card)
-        return deck_sorted_by_card_type
+        return {card_type: self.renderer.cards(card_type) for card_type in CARD_TYPES}
     
     @property
     def deckcode(self) -> str:
-        concatenated_string_with_counts_and_cards = ""
-        for card_id, count in self.cards_and_counts.items():
-            if 1 <= count <= 3:
-                concatenated_string_with_counts_and_cards += f"{count}:{card_id},"
-        # remove trailing comma
-        if concatenated_string_with_counts_and_cards.endswith(","):
-            concatenated_string_with_counts_and_cards = (
-                concatenated_string_with_counts_and_cards[:-1]
-            )
-        return base64.standard_b64encode(concatenated_string_with_counts_and_cards.encode()).decode()
+        return DeckCodec.encode(self.cards_and_counts)
 
     def create_cards_and_counts_from_deckcode(self, deckcode: str) -> None:
-        """Transforms a deckcode to a dict containing card_id: count"""
-        # strip [<deckname>] from the start of the deckcode
-        if deckcode.startswith("[") and "]" in deckcode:
-            deckcode = deckcode[deckcode.index("]") + 1 :]
-        # decode
-        concatenated_string_with_counts_and_cards = base64.b64decode(deckcode).decode()
-        list_with_counts_and_cards = concatenated_string_with_counts_and_cards.split(",")
-        self.cards_and_counts = {}
-        for count_and_card in list_with_counts_and_cards:
-            count, card_id = count_and_card.split(":")
-            self.cards_and_counts[card_id] = count
+        """Transforms a deckcode to a dict containing card_id: count (validated against the card pool)"""
+        self.restore_cards_and_counts(DeckCodec(card_pool=self.card_pool).decode(deckcode))
+
+    def restore_cards_and_counts(self, cards_and_counts: Dict[int, int]) -> None:
+        '''sets already checked cards and counts, e.g. of a saved deck'''
+        self.cards_and_counts.clear()
+        self.cards_and_counts.update(cards_and_counts)
+        self._recount_cards()
+
+    def _recount_cards(self) -> None:
+        self._amount_cards = 0
+        self.amount_cards_by_card_type.clear()
+        self.amount_minions_by_mana.clear()
+        self.renderer.clear()
+        for card_id, count in self.cards_and_counts.items():
+            self._count_card(card=self.card_pool.cards_by_id.get(card_id), count=count)
+
+    def _count_card(self, card: Optional[CardData], count: int) -> None:
+        self._amount_cards += count
+        if card is not None:
+            self.amount_cards_by_card_type[card.card_type] += count
+            if card.card_type_code == MINION_CARD_TYPE_CODE:
+                self.amount_minions_by_mana[card.mana] += count
+            self.renderer.set_card_count(card=card, count=self.cards_and_counts[card.id])
 
     def add_card_and_count(self, card_id: int, count: int) -> None:
         card: CardData = self.card_pool.get_card_data_by_card_id(card_id)
         # first card added to the deck has to be a general
         if self.amount_cards == 0:
-            if card.card_type == "General" and count == 1:
+            if card.card_type_code == GENERAL_CARD_TYPE_CODE and count == 1:
                 self.faction = card.faction
             else:
                 raise ValueError("The first card must be one general")
         # All further cards can't be Tokens and Generals, must be from the generals faction or neutral and the new count has to be between 1 and 3 and the resulting decksize mustn't be greater than the maximum deck size
         else:
             if not (
-                card.rarity in ["Common", "Rare", "Epic", "Legendary"]
-                and card.faction in [self.faction, "Neutral"]
+                card.rarity_code in DECK_RARITY_CODES
+                and card.faction_code in (FACTION_CODES[self.faction], NEUTRAL_FACTION_CODE)
                 and 1 <= self.cards_and_counts[card.id] + count <= 3
                 and self.amount_cards + count <= self.max_cards
             ):
                 raise ValueError("Either the card has the wrong rarity or faction or with the addition the count of the card is not between 1 and 3 or the deck has too much cards after the addition of the card(s)")
         # update deck
         self.cards_and_counts[card.id] += count
+        self._count_card(card=card, count=count)
 
     def get_cards_by_card_type_sorted_by_cost_and_alphabetical(self, card_type: Literal["General", "Minion", "Spell", "Artifact"]) -> List[CardData]:
-        return sorted(self.deck_sorted_by_card_type[card_type], key=lambda card: (card.mana, card.name))
+        return self.renderer.cards(card_type)
     
     def create_deck_embed(self) -> discord.Embed:
-        units = self.get_cards_by_card_type_sorted_by_cost_and_alphabetical("Minion")
-        units_formatted = self._card_list_to_string(card_list=units)
-        spells = self.get_cards_by_card_type_sorted_by_cost_and_alphabetical("Spell")
-        spells_formatted = self._card_list_to_string(card_list=spells)
-        artifacts = self.get_cards_by_card_type_sorted_by_cost_and_alphabetical("Artifact")
-        artifacts_formatted = self._card_list_to_string(card_list=artifacts)
+        units_formatted = self.renderer.field("Minion")
+        spells_formatted = self.renderer.field("Spell")
+        artifacts_formatted = self.renderer.field("Artifact")
         if self.card_pool.legacy:
             embed=discord.Embed(title="Drafted Deck", url=LEGACY_DECKLINK_PREFIX + self.deckcode)
         else:
@@ -97,11 +102,3 @@ class Deck:
         embed.add_field(name="Spells", value=spells_formatted, inline=True)
         embed.add_field(name="Artifacts", value=artifacts_formatted, inline=True)
         return embed
-
-    def _card_list_to_string(self, card_list: List[CardData]) -> str:
-        concatenated_list = ""
-        for card in card_list:
-            for collectible_card in self.card_pool.collectible_cards:
-                if card.id == collectible_card.id:
-                    concatenated_list += f"{self.cards_and_counts[card.id]}x {collectible_card.name}\n"
-        return concatenated_list
\ No newline at end of file
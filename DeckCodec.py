@@ -0,0 +1,112 @@
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple, Union
+import base64
+import binascii
+import functools
+from CardPool import CardPool
+from CardData import GENERAL_CARD_TYPE_CODE
+
+DIGITS = b"0123456789"
+
+
+class _CardsAndCountsByEntry(dict):
+    '''card_id, count by <count>:<card_id> entry, parsed on the first lookup - the same entries come up in many deckcodes'''
+    def __missing__(self, entry: bytes) -> Tuple[int, int]:
+        # without the digits only the ":" may be left, int raises the ValueError for an empty number
+        if entry.translate(None, DIGITS) != b":":
+            raise ValueError(f"{entry!r} is no <count>:<card_id> entry")
+        count, card_id = entry.split(b":")
+        card_and_count = self[entry] = (int(card_id), int(count))
+        return card_and_count
+
+
+class DeckCodec:
+    '''Encodes cards and counts to deckcodes and decodes deckcodes to int cards and counts
+
+    With a card pool the decoded decks are validated against its card index: every card has to exist with a count
+    from 1 to 3 and the deck has exactly one general.
+    '''
+    def __init__(self, card_pool: Optional[CardPool] = None) -> None:
+        self.card_pool = card_pool
+        self._parsed_cards_and_counts_by_entry = _CardsAndCountsByEntry()
+
+    @functools.cached_property
+    def _valid_cards_and_counts_by_entry(self) -> Dict[bytes, Tuple[int, int]]:
+        '''card_id, count by every <count>:<card_id> entry, that is valid in the card pool'''
+        return {f"{count}:{card_id}".encode("ascii"): (card_id, count) for card_id in self.card_pool.cards_by_id for count in (1, 2, 3)}
+
+    @functools.cached_property
+    def _general_entries(self) -> FrozenSet[bytes]:
+        return frozenset([f"{count}:{card.id}".encode("ascii") for card in self.card_pool.generals for count in (1, 2, 3)])
+
+    @functools.cached_property
+    def _single_general_entries(self) -> FrozenSet[bytes]:
+        return frozenset([f"1:{card.id}".encode("ascii") for card in self.card_pool.generals])
+
+    @staticmethod
+    def encode(cards_and_counts: Union[Mapping[int, int], Iterable[Tuple[int, int]]]) -> str:
+        '''deckcode of card_id: count (in the given order) - cards with counts outside of 1 to 3 are left out'''
+        if isinstance(cards_and_counts, Mapping):
+            cards_and_counts = cards_and_counts.items()
+        decoded_deckcode = ",".join([f"{count}:{card_id}" for card_id, count in cards_and_counts if 1 <= count <= 3])
+        return base64.b64encode(decoded_deckcode.encode("ascii")).decode("ascii")
+
+    def decode(self, deckcode: str) -> Dict[int, int]:
+        '''card_id: count of a deckcode (optionally starting with [<deckname>]), invalid deckcodes raise a ValueError'''
+        # <count>:<card_id> entries separated by commas, the general is the first entry
+        entries = self._decode_base64(deckcode).split(b",")
+        if self.card_pool is not None:
+            # a valid deck is decoded and validated with lookups of its whole entries, every other deckcode is parsed
+            # below for the error (or, if it is valid, e.g. with the general not first)
+            try:
+                cards_and_counts = dict(map(self._valid_cards_and_counts_by_entry.__getitem__, entries))
+            except KeyError:
+                pass
+            else:
+                if len(cards_and_counts) == len(entries) and entries[0] in self._single_general_entries and self._general_entries.isdisjoint(entries[1:]):
+                    return cards_and_counts
+        try:
+            cards_and_counts = dict(map(self._parsed_cards_and_counts_by_entry.__getitem__, entries))
+        except ValueError:
+            raise ValueError(f"The deckcode {deckcode} doesn't consist of <count>:<card_id> entries") from None
+        if len(cards_and_counts) != len(entries):
+            raise ValueError(f"The deckcode {deckcode} contains a card id more than once")
+        if self.card_pool is not None:
+            self._validate(deckcode=deckcode, cards_and_counts=cards_and_counts)
+        return cards_and_counts
+
+    def decode_many(self, deckcodes: Iterable[str]) -> List[Dict[int, int]]:
+        '''decodes a list of deckcodes (e.g. of a spreadsheet), the position of an invalid deckcode is in the ValueError'''
+        # a single try covers the whole loop, so a valid deckcode costs only the decode
+        decode = self.decode
+        decks: List[Dict[int, int]] = []
+        append = decks.append
+        try:
+            for deckcode in deckcodes:
+                append(decode(deckcode))
+        except ValueError as e:
+            raise ValueError(f"Deckcode {len(decks)}: {e}") from None
+        return decks
+
+    def _decode_base64(self, deckcode: str) -> bytes:
+        # strip [<deckname>] from the start of the deckcode
+        if deckcode.startswith("[") and "]" in deckcode:
+            deckcode = deckcode[deckcode.index("]") + 1 :]
+        try:
+            return base64.b64decode(deckcode.strip(), validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError(f"The deckcode {deckcode} is no valid base64")
+
+    def _validate(self, deckcode: str, cards_and_counts: Dict[int, int]) -> None:
+        cards_by_id = self.card_pool.cards_by_id
+        amount_generals = 0
+        for card_id, count in cards_and_counts.items():
+            card = cards_by_id.get(card_id)
+            if card is None:
+                raise ValueError(f"The deckcode {deckcode} contains the card id {card_id}, which isn't in the card pool")
+            if not 1 <= count <= 3:
+                raise ValueError(f"The deckcode {deckcode} contains the card {card.name} {count} times, but only 1 to 3 copies are allowed")
+            if card.card_type_code == GENERAL_CARD_TYPE_CODE:
+                amount_generals += count
+        if amount_generals != 1:
+            raise ValueError(f"The deckcode {deckcode} contains {amount_generals} generals, but a deck needs exactly one")
+
@@ -0,0 +1,52 @@
+from typing import Dict, List, Optional, Tuple
+import bisect
+from CardData import CardData, CARD_TYPES
+
+
+class DeckRenderer:
+    '''Keeps the cards of a deck bucketed by card type and sorted by (mana, name) while they are added
+
+    Every card has a cached "<count>x <name>" line and every card type a cached field text, which is only joined
+    again after a card of that type changed - so rendering the deck embed after a pick doesn't scan the card pool.
+    '''
+    def __init__(self) -> None:
+        # (mana, name, card id) of the cards of each card type in sorted order
+        self.sort_keys_by_card_type: Dict[str, List[Tuple[int, str, int]]] = {card_type: [] for card_type in CARD_TYPES}
+        self.cards_by_id: Dict[int, CardData] = {}
+        self.lines_by_card_id: Dict[int, str] = {}
+        self._fields_by_card_type: Dict[str, Optional[str]] = {card_type: None for card_type in CARD_TYPES}
+
+    def set_card_count(self, card: CardData, count: int) -> None:
+        '''sets the count of a card in the deck - a count of 0 removes the card'''
+        sort_keys = self.sort_keys_by_card_type[card.card_type]
+        sort_key = (card.mana, card.name, card.id)
+        if count <= 0:
+            if card.id in self.cards_by_id:
+                sort_keys.pop(bisect.bisect_left(sort_keys, sort_key))
+                del self.cards_by_id[card.id]
+                del self.lines_by_card_id[card.id]
+        else:
+            if card.id not in self.cards_by_id:
+                bisect.insort(sort_keys, sort_key)
+                self.cards_by_id[card.id] = card
+            self.lines_by_card_id[card.id] = f"{count}x {card.name}\n"
+        self._fields_by_card_type[card.card_type] = None
+
+    def clear(self) -> None:
+        for card_type in CARD_TYPES:
+            self.sort_keys_by_card_type[card_type].clear()
+            self._fields_by_card_type[card_type] = None
+        self.cards_by_id.clear()
+        self.lines_by_card_id.clear()
+
+    def cards(self, card_type: str) -> List[CardData]:
+        '''cards of the card type sorted by mana and name'''
+        return [self.cards_by_id[card_id] for _, _, card_id in self.sort_keys_by_card_type[card_type]]
+
+    def field(self, card_type: str) -> str:
+        '''"<count>x <name>" lines of the cards of the card type sorted by mana and name'''
+        field = self._fields_by_card_type[card_type]
+        if field is None:
+            field = "".join([self.lines_by_card_id[card_id] for _, _, card_id in self.sort_keys_by_card_type[card_type]])
+            self._fields_by_card_type[card_type] = field
+        return field
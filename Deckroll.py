@@ -1,15 +1,19 @@
-from typing import Dict, List, Literal, Optional
+from typing import Deque, Dict, Iterator, List, Literal, Mapping, Optional, Tuple
 from CardPool import CardPool
-from CardData import CardData
-import random
 from Deck import Deck
+from DeckrollSampler import DeckrollSampler
+import numpy as np
 import xlsxwriter
 import datetime
-from tenacity import retry, stop_after_attempt
-from constants import DECKLINK_PREFIX, LEGACY_DECKLINK_PREFIX
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from constants import DECKLINK_PREFIX, LEGACY_DECKLINK_PREFIX, DECKROLL_MODIFICATION_NOT_GIVEN
 
-DECKROLL_ATTEMPTS = 100
-DECKROLL_MODIFICATION_NOT_GIVEN = -1
+# the bulk rolls are split into shards of this size, each with its own random stream, so the rolled decks
+# for a given seed don't depend on the amount of workers
+DECKROLL_SHARD_SIZE = 10000
+EXCEL_MAX_ROWS = 1048576
 
 class Deckroll:
     def __init__(
@@ -17,7 +21,7 @@ class Deckroll:
         card_pool: CardPool,
         amount_cards: int,
         factions_and_weights: Dict[Literal["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar"], int],
-        cards_and_weights: Dict[int, float],
+        cards_and_weights: Mapping[int, float],
         count_chances: Dict[int, float],
         count_chances_two_remaining_deck_slots: Dict[int, float],
         min_1_and_2_drops: int = DECKROLL_MODIFICATION_NOT_GIVEN,
@@ -31,10 +35,30 @@ class Deckroll:
         self.count_chances_two_remaining_deck_slots = count_chances_two_remaining_deck_slots
         self.min_1_and_2_drops = min_1_and_2_drops
         self.max_1_and_2_drops = max_1_and_2_drops
+        self.rng = np.random.default_rng()
+        self._sampler: Optional[DeckrollSampler] = None
+
+    @property
+    def sampler(self) -> DeckrollSampler:
+        # built on the first roll, so invalid settings raise their ValueError on the roll and not on the init
+        if self._sampler is None:
+            self._sampler = DeckrollSampler(
+                card_pool=self.card_pool,
+                amount_cards=self.amount_cards,
+                factions_and_weights=self.factions_and_weights,
+                cards_and_weights=self.cards_and_weights,
+                count_chances=self.count_chances,
+                count_chances_two_remaining_deck_slots=self.count_chances_two_remaining_deck_slots,
+                min_1_and_2_drops=self.min_1_and_2_drops,
+                max_1_and_2_drops=self.max_1_and_2_drops,
+            )
+        return self._sampler
 
     def roll_deck_spreadsheat(
         self,
         amount_decks: int,
+        seed: Optional[int] = None,
+        workers: int = 1,
     ) -> str:
         decklink_prefix = LEGACY_DECKLINK_PREFIX if self.card_pool.legacy else DECKLINK_PREFIX
         if amount_decks < 0 or amount_decks > 10**7:
@@ -42,10 +66,13 @@ class Deckroll:
         start_time = datetime.datetime.now()
         path: str = "created_deckroll_excel_files/"
         workbook_name: str = f"Deckroll-{datetime.date.today().isoformat()}.xlsx"
-        with xlsxwriter.Workbook(path + workbook_name) as workbook:
-            worksheet = workbook.add_worksheet("rolled decks")
-            for row in range(amount_decks):
-                deckcode = self.roll_deck()
+        # constant memory writes the rows straight to disk, an excel worksheet can't hold more than EXCEL_MAX_ROWS rows
+        with xlsxwriter.Workbook(path + workbook_name, {"constant_memory": True}) as workbook:
+            for index, deckcode in enumerate(self.roll_decks_in_parallel(amount_decks, seed=seed, workers=workers)):
+                row = index % EXCEL_MAX_ROWS
+                if row == 0:
+                    worksheet_number = index // EXCEL_MAX_ROWS + 1
+                    worksheet = workbook.add_worksheet("rolled decks" if worksheet_number == 1 else f"rolled decks {worksheet_number}")
                 worksheet.write(row, 0, deckcode)
                 worksheet.write(row, 1, decklink_prefix + deckcode)
         end_time = datetime.datetime.now()
@@ -53,56 +80,69 @@ class Deckroll:
         print(f"Created Excel {workbook_name} with {amount_decks} rolled decks in {needed_time}")
         return workbook_name
 
-    @retry(stop=stop_after_attempt(DECKROLL_ATTEMPTS))
+    def roll_decks(self, amount_decks: int, seed: Optional[int] = None) -> Iterator[str]:
+        """Lazily yields the deckcodes of amount_decks rolled decks
+
+        The sampler is prepared once for the whole batch and the decks are rolled with own random generators
+        without touching rolled_deck / rolled_faction, so this can be used for millions of decks in constant memory.
+        The decks are rolled in the same shards with the same random streams as in roll_decks_in_parallel, so the
+        same seed gives the same decks with both methods
+        """
+        sampler = self.sampler
+        for shard_size, shard_seed_sequence in _deckroll_shards(amount_decks=amount_decks, seed=seed):
+            rng = np.random.default_rng(shard_seed_sequence)
+            for _ in range(shard_size):
+                yield sampler.roll_deckcode(rng)
+
+    def roll_decks_in_parallel(self, amount_decks: int, seed: Optional[int] = None, workers: Optional[int] = None) -> Iterator[str]:
+        """Lazily yields the deckcodes of amount_decks rolled decks, which are rolled in shards by a pool of worker processes
+
+        Every shard gets its own random stream spawned from the seed and the shards are yielded in order,
+        so the same seed gives the same decks for any amount of workers
+        """
+        sampler = self.sampler
+        shards = _deckroll_shards(amount_decks=amount_decks, seed=seed)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(shards) <= 1:
+            yield from self.roll_decks(amount_decks=amount_decks, seed=seed)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # only a few shards per worker are in flight, so the memory stays bounded even if the consumer is slow
+            pending_shards: Deque[Future] = deque()
+            for shard_size, shard_seed_sequence in shards:
+                pending_shards.append(executor.submit(_roll_deckcode_shard, sampler, shard_size, shard_seed_sequence))
+                if len(pending_shards) >= 2 * workers:
+                    yield from pending_shards.popleft().result()
+            while pending_shards:
+                yield from pending_shards.popleft().result()
+
     def roll_deck(self) -> str:
         # init deck
         self.rolled_deck = Deck(card_pool=self.card_pool)
         self.rolled_deck.max_cards = self.amount_cards
         # roll deck
-        self._roll_faction()
-        self._roll_general()
-        self._roll_collectible_cards()
+        self.rolled_faction, rolled_general_id, rolled_card_ids, rolled_counts = self.sampler.roll_deck(self.rng)
+        self.rolled_deck.add_card_and_count(rolled_general_id, 1)
+        for rolled_card_id, rolled_count in zip(rolled_card_ids.tolist(), rolled_counts.tolist()):
+            self.rolled_deck.add_card_and_count(card_id=rolled_card_id, count=rolled_count)
         # check deck
         self._check_amount_of_1_and_2_drops()
         return self.rolled_deck.deckcode
 
-    def _roll_faction(self) -> None:
-        self.rolled_faction = random.choices(list(self.factions_and_weights.keys()), weights=list(self.factions_and_weights.values()))[0]
-
-    def _roll_general(self) -> None:
-        generals_from_faction = self.card_pool.generals_by_faction[self.rolled_faction]
-        rolled_general = random.choice(generals_from_faction)
-        self.rolled_deck.add_card_and_count(rolled_general.id, 1)
-
-    def _roll_collectible_cards(self) -> None:
-        faction_and_neutral_cards: List[CardData] = self.card_pool.collectible_cards_by_faction[self.rolled_faction] + self.card_pool.collectible_cards_by_faction["Neutral"]
-        cards_and_weights_specific_roll: Dict[int, int] = {}
-        for faction_and_neutral_card in faction_and_neutral_cards:
-            cards_and_weights_specific_roll[faction_and_neutral_card.id] = self.cards_and_weights[faction_and_neutral_card.id]
-        while self.rolled_deck.remaining_cards > 0:
-            rolled_card_id = random.choices(list(cards_and_weights_specific_roll.keys()), weights=list(cards_and_weights_specific_roll.values()))[0]
-            self._roll_card_count(rolled_card_id)
-            cards_and_weights_specific_roll[rolled_card_id] = 0
-
-    def _roll_card_count(self, card_id: int) -> None:
-        if self.rolled_deck.remaining_cards == 1:
-            count = 1
-        elif self.rolled_deck.remaining_cards == 2:
-            count = random.choices(list(self.count_chances_two_remaining_deck_slots.keys()), list(self.count_chances_two_remaining_deck_slots.values()))[0]
-        else:
-            count = random.choices(list(self.count_chances.keys()), list(self.count_chances.values()))[0]
-        self.rolled_deck.add_card_and_count(card_id=card_id, count=count)
-
     def _check_amount_of_1_and_2_drops(self) -> None:
-        if self.min_1_and_2_drops != DECKROLL_MODIFICATION_NOT_GIVEN or self.max_1_and_2_drops:
-            minions_sorted = self.rolled_deck.get_cards_by_card_type_sorted_by_cost_and_alphabetical(card_type="Minion")
-            amount_1_and_2_drops = 0
-            for minion in minions_sorted:
-                if minion.mana <= 2:
-                    amount_1_and_2_drops += self.rolled_deck.cards_and_counts[minion.id]
-                else:
-                    break
+        amount_1_and_2_drops = self.rolled_deck.amount_1_and_2_drops
         if self.min_1_and_2_drops != DECKROLL_MODIFICATION_NOT_GIVEN and amount_1_and_2_drops < self.min_1_and_2_drops:
             raise ValueError("Check failed - the rolled deck has less 1 and 2 drops than needed")
         if self.max_1_and_2_drops != DECKROLL_MODIFICATION_NOT_GIVEN and amount_1_and_2_drops > self.max_1_and_2_drops:
             raise ValueError("Check failed - the rolled deck has more 1 and 2 drops than needed")
+
+def _deckroll_shards(amount_decks: int, seed: Optional[int]) -> List[Tuple[int, np.random.SeedSequence]]:
+    '''sizes and random streams of the shards of a bulk roll - every shard but the last has DECKROLL_SHARD_SIZE decks'''
+    shard_sizes = [DECKROLL_SHARD_SIZE] * (amount_decks // DECKROLL_SHARD_SIZE)
+    if amount_decks % DECKROLL_SHARD_SIZE:
+        shard_sizes.append(amount_decks % DECKROLL_SHARD_SIZE)
+    return list(zip(shard_sizes, np.random.SeedSequence(seed).spawn(len(shard_sizes))))
+
+def _roll_deckcode_shard(sampler: DeckrollSampler, amount_decks: int, seed_sequence: np.random.SeedSequence) -> List[str]:
+    rng = np.random.default_rng(seed_sequence)
+    return [sampler.roll_deckcode(rng) for _ in range(amount_decks)]
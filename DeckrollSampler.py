@@ -0,0 +1,332 @@
+from bisect import bisect_right
+from typing import Dict, List, Literal, Mapping, Optional, Tuple
+import numpy as np
+from CardPool import CardPool
+from CardWeights import card_weights_vector
+from DeckCodec import DeckCodec
+from Metrics import metrics
+from CardData import DECK_RARITY_CODES, FACTION_CODES, MINION_CARD_TYPE_CODE, NEUTRAL_FACTION_CODE
+from constants import DECKROLL_ATTEMPTS, DECKROLL_MODIFICATION_NOT_GIVEN
+
+CONSTRUCTIVE_MAX_TILT = 10**6
+# decks, that are rolled at once to estimate the chance, that a roll passes the 1 and 2 drop limits
+ACCEPTANCE_RATE_SAMPLES = 256
+ACCEPTANCE_RATE_SEED = 0
+
+
+class DeckrollSampler:
+    '''Precomputed sampling tables of a deckroll, that draw all cards of a deck in one vectorized pass
+
+    Up to DECKROLL_ATTEMPTS decks are rolled and checked against the 1 and 2 drop limits like before and if none
+    of them fits, the deck is rolled constructively, so a roll always succeeds after a bounded time. If the estimated
+    acceptance rate says, that the attempts would most likely all fail, the deck is rolled constructively right away.
+    '''
+    def __init__(
+        self,
+        card_pool: CardPool,
+        amount_cards: int,
+        factions_and_weights: Dict[Literal["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar"], int],
+        cards_and_weights: Mapping[int, float],
+        count_chances: Dict[int, float],
+        count_chances_two_remaining_deck_slots: Dict[int, float],
+        min_1_and_2_drops: int = DECKROLL_MODIFICATION_NOT_GIVEN,
+        max_1_and_2_drops: int = DECKROLL_MODIFICATION_NOT_GIVEN,
+    ) -> None:
+        self.amount_cards = amount_cards
+        self.min_1_and_2_drops = min_1_and_2_drops
+        self.max_1_and_2_drops = max_1_and_2_drops
+        self.limits_1_and_2_drops = min_1_and_2_drops != DECKROLL_MODIFICATION_NOT_GIVEN or max_1_and_2_drops != DECKROLL_MODIFICATION_NOT_GIVEN
+        # the limits as range, that is used for the constructive roll
+        self.lowest_amount_1_and_2_drops = max(min_1_and_2_drops, 0)
+        self.highest_amount_1_and_2_drops = amount_cards if max_1_and_2_drops == DECKROLL_MODIFICATION_NOT_GIVEN else max_1_and_2_drops
+
+        # factions
+        self.factions: List[str] = [faction for faction, weight in factions_and_weights.items() if weight > 0]
+        if not self.factions:
+            raise ValueError("At least one faction needs a weight greater than 0")
+        faction_weights = np.array([factions_and_weights[faction] for faction in self.factions], dtype=np.float64)
+        self.faction_probabilities = faction_weights / faction_weights.sum()
+        self.faction_cumulative_probabilities: List[float] = np.cumsum(self.faction_probabilities).tolist()
+
+        # generals, cards and weights per faction - only cards with a weight greater than 0 can be rolled
+        self.general_ids_by_faction: Dict[str, np.ndarray] = {}
+        self.card_ids_by_faction: Dict[str, np.ndarray] = {}
+        self.card_weights_by_faction: Dict[str, np.ndarray] = {}
+        self.card_is_1_or_2_drop_by_faction: Dict[str, np.ndarray] = {}
+        columns = card_pool.collectible_card_columns
+        card_weights = card_weights_vector(card_pool=card_pool, cards_and_weights=cards_and_weights)
+        # Mythron cards are collectible, but can't be added to a Deck, so they are never rolled
+        rollable = np.isin(columns["rarity"], list(DECK_RARITY_CODES)) & (card_weights > 0)
+        card_is_1_or_2_drop = (columns["card_type"] == MINION_CARD_TYPE_CODE) & (columns["mana"] <= 2)
+        for faction in self.factions:
+            self.general_ids_by_faction[faction] = np.array([general.id for general in card_pool.generals_by_faction[faction]], dtype=np.int64)
+            faction_and_neutral_cards = rollable & ((columns["faction"] == FACTION_CODES[faction]) | (columns["faction"] == NEUTRAL_FACTION_CODE))
+            self.card_ids_by_faction[faction] = columns["id"][faction_and_neutral_cards]
+            self.card_weights_by_faction[faction] = card_weights[faction_and_neutral_cards]
+            self.card_is_1_or_2_drop_by_faction[faction] = card_is_1_or_2_drop[faction_and_neutral_cards]
+
+        # count chances - rolled by searching uniform random numbers in the cumulative probabilities
+        self.count_values, self.count_cumulative_probabilities = self._prepare_count_chances(count_chances)
+        self.count_values_two_remaining_deck_slots, self.count_cumulative_probabilities_two_remaining_deck_slots = self._prepare_count_chances(count_chances_two_remaining_deck_slots)
+
+        # constructive roll - factions, which can't fill a deck within the 1 and 2 drop limits at all, are excluded
+        self.count_chances = self._normalize_count_chances(count_chances)
+        self.count_chances_two_remaining_deck_slots = self._normalize_count_chances(count_chances_two_remaining_deck_slots)
+        self.constructive_factions = [
+            faction for faction in self.factions
+            if self._deck_can_be_completed(
+                remaining_cards=amount_cards - 1,
+                amount_1_and_2_drops=0,
+                remaining_1_and_2_drop_cards=int(self.card_is_1_or_2_drop_by_faction[faction].sum()),
+                remaining_other_cards=int((~self.card_is_1_or_2_drop_by_faction[faction]).sum()),
+            )
+        ]
+        if not self.constructive_factions:
+            fillable_factions = [faction for faction in self.factions if 3 * len(self.card_weights_by_faction[faction]) >= amount_cards - 1]
+            if self.limits_1_and_2_drops and fillable_factions:
+                # every card can fill 1 to 3 deck slots, so these are the amounts of 1 and 2 drops, that the factions can reach at all
+                lowest_possible = min(max(0, amount_cards - 1 - 3 * int((~self.card_is_1_or_2_drop_by_faction[faction]).sum())) for faction in fillable_factions)
+                highest_possible = max(min(amount_cards - 1, 3 * int(self.card_is_1_or_2_drop_by_faction[faction].sum())) for faction in fillable_factions)
+                raise ValueError(f"No deck with {self.lowest_amount_1_and_2_drops} to {self.highest_amount_1_and_2_drops} 1 and 2 drops can be rolled with the given card weights and amount of cards - possible are {lowest_possible} to {highest_possible} 1 and 2 drops")
+            raise ValueError(f"There are not enough cards with a weight greater than 0 to fill a deck with {amount_cards} cards")
+        # the decks, that pass the check of a rare limit, have more (or less) 1 and 2 drops throughout, so the weights
+        # of the 1 and 2 drops are tilted in a way, that the expected amount of 1 and 2 drops is within the limits
+        self.constructive_1_and_2_drop_tilt_by_faction: Dict[str, float] = {}
+        for faction in self.constructive_factions:
+            card_is_1_or_2_drop = self.card_is_1_or_2_drop_by_faction[faction]
+            weight_1_and_2_drops = self.card_weights_by_faction[faction][card_is_1_or_2_drop].sum()
+            weight_others = self.card_weights_by_faction[faction][~card_is_1_or_2_drop].sum()
+            remaining_cards = amount_cards - 1
+            # without any card with a weight greater than 0 (only possible for a deck of just the general) both groups have probability 0
+            if weight_1_and_2_drops + weight_others > 0:
+                expected_amount_1_and_2_drops = remaining_cards * weight_1_and_2_drops / (weight_1_and_2_drops + weight_others)
+            else:
+                expected_amount_1_and_2_drops = 0.0
+            target_amount_1_and_2_drops = min(max(expected_amount_1_and_2_drops, self.lowest_amount_1_and_2_drops), self.highest_amount_1_and_2_drops)
+            if target_amount_1_and_2_drops == expected_amount_1_and_2_drops or weight_1_and_2_drops == 0 or weight_others == 0:
+                tilt = 1.0
+            elif target_amount_1_and_2_drops >= remaining_cards:
+                tilt = CONSTRUCTIVE_MAX_TILT
+            else:
+                tilt = target_amount_1_and_2_drops * weight_others / ((remaining_cards - target_amount_1_and_2_drops) * weight_1_and_2_drops)
+            self.constructive_1_and_2_drop_tilt_by_faction[faction] = min(max(tilt, 1 / CONSTRUCTIVE_MAX_TILT), CONSTRUCTIVE_MAX_TILT)
+        constructive_faction_weights = np.array([factions_and_weights[faction] for faction in self.constructive_factions], dtype=np.float64)
+        self.constructive_faction_cumulative_probabilities: List[float] = np.cumsum(constructive_faction_weights / constructive_faction_weights.sum()).tolist()
+
+        # the retries are only worth it, if at least one of the DECKROLL_ATTEMPTS rolls is expected to pass the limits
+        acceptance_rate_rng = np.random.default_rng(ACCEPTANCE_RATE_SEED)
+        self.acceptance_rate = sum(
+            faction_probability * self.estimate_acceptance_rate(faction=faction, rng=acceptance_rate_rng)
+            for faction, faction_probability in zip(self.factions, self.faction_probabilities.tolist())
+        )
+        self.rejection_attempts = DECKROLL_ATTEMPTS if self.acceptance_rate * DECKROLL_ATTEMPTS >= 1 else 0
+
+    @staticmethod
+    def _prepare_count_chances(count_chances: Dict[int, float]) -> Tuple[np.ndarray, np.ndarray]:
+        count_values = np.array(list(count_chances.keys()), dtype=np.int64)
+        count_weights = np.array(list(count_chances.values()), dtype=np.float64)
+        if count_weights.sum() <= 0:
+            raise ValueError(f"The count chances {count_chances} must sum up to more than 0")
+        return count_values, np.cumsum(count_weights / count_weights.sum())
+
+    @staticmethod
+    def _normalize_count_chances(count_chances: Dict[int, float]) -> Dict[int, float]:
+        total_chance = sum(count_chances.values())
+        return {count: chance / total_chance for count, chance in count_chances.items()}
+
+    def roll_faction(self, rng: np.random.Generator) -> str:
+        return self._roll_faction_from(self.factions, self.faction_cumulative_probabilities, rng)
+
+    @staticmethod
+    def _roll_faction_from(factions: List[str], faction_cumulative_probabilities: List[float], rng: np.random.Generator) -> str:
+        faction_index = bisect_right(faction_cumulative_probabilities, rng.random())
+        # guards against the last cumulative probability being rounded below 1
+        return factions[min(faction_index, len(factions) - 1)]
+
+    def roll_general(self, faction: str, rng: np.random.Generator) -> int:
+        general_ids = self.general_ids_by_faction[faction]
+        return int(general_ids[rng.integers(len(general_ids))])
+
+    def roll_deck(self, rng: np.random.Generator) -> Tuple[str, int, np.ndarray, np.ndarray]:
+        '''Rolls faction, general id, card ids and card counts of one deck, that fulfills the 1 and 2 drop limits'''
+        for attempt in range(self.rejection_attempts):
+            faction = self.roll_faction(rng)
+            try:
+                card_indices, counts = self._roll_collectible_card_indices(faction=faction, rng=rng)
+            except ValueError:
+                # not enough cards with a weight greater than 0 to fill the deck
+                continue
+            if self.limits_1_and_2_drops:
+                amount_1_and_2_drops = int(counts[self.card_is_1_or_2_drop_by_faction[faction][card_indices]].sum())
+                if not self.lowest_amount_1_and_2_drops <= amount_1_and_2_drops <= self.highest_amount_1_and_2_drops:
+                    continue
+            if attempt > 0:
+                metrics.increment("sampler_rejected_decks_total", attempt)
+            return faction, self.roll_general(faction=faction, rng=rng), self.card_ids_by_faction[faction][card_indices], counts
+        if self.rejection_attempts > 0:
+            metrics.increment("sampler_rejected_decks_total", self.rejection_attempts)
+        metrics.increment("sampler_constructive_rolls_total")
+        faction = self._roll_faction_from(self.constructive_factions, self.constructive_faction_cumulative_probabilities, rng)
+        card_indices, counts = self._roll_collectible_card_indices_constructively(faction=faction, rng=rng)
+        return faction, self.roll_general(faction=faction, rng=rng), self.card_ids_by_faction[faction][card_indices], counts
+
+    def estimate_acceptance_rate(self, faction: str, amount_samples: int = ACCEPTANCE_RATE_SAMPLES, rng: Optional[np.random.Generator] = None) -> float:
+        '''Estimated chance, that a deck of the faction rolled without the constructive roll passes the 1 and 2 drop limits
+
+        All amount_samples decks are rolled at once like in _roll_collectible_card_indices, only the last card of a deck
+        fills just the remaining deck slots instead of following the count chances of the last two deck slots.
+        '''
+        if not self.limits_1_and_2_drops:
+            return 1.0
+        rng = rng if rng is not None else np.random.default_rng(ACCEPTANCE_RATE_SEED)
+        card_weights = self.card_weights_by_faction[faction]
+        remaining_cards = self.amount_cards - 1
+        amount_draws = min(remaining_cards, len(card_weights))
+        if amount_draws == 0:
+            return float(remaining_cards == 0 and self.lowest_amount_1_and_2_drops == 0)
+        keys = rng.standard_exponential((amount_samples, len(card_weights))) / card_weights
+        if amount_draws < len(card_weights):
+            card_indices = np.argpartition(keys, amount_draws - 1, axis=1)[:, :amount_draws]
+        else:
+            card_indices = np.broadcast_to(np.arange(len(card_weights)), keys.shape)
+        card_indices = np.take_along_axis(card_indices, np.argsort(np.take_along_axis(keys, card_indices, axis=1), axis=1), axis=1)
+        counts = self._roll_counts(self.count_values, self.count_cumulative_probabilities, rng.random((amount_samples, amount_draws)))
+        counts = np.clip(remaining_cards - (np.cumsum(counts, axis=1) - counts), 0, counts)
+        # decks, that can't be filled with the cards with a weight greater than 0, fail like in roll_deck
+        filled = counts.sum(axis=1) == remaining_cards
+        amounts_1_and_2_drops = (counts * self.card_is_1_or_2_drop_by_faction[faction][card_indices]).sum(axis=1)
+        accepted = filled & (amounts_1_and_2_drops >= self.lowest_amount_1_and_2_drops) & (amounts_1_and_2_drops <= self.highest_amount_1_and_2_drops)
+        return float(accepted.mean())
+
+    def roll_deckcode(self, rng: np.random.Generator) -> str:
+        _, general_id, card_ids, counts = self.roll_deck(rng)
+        return deckcode_from_cards_and_counts(general_id=general_id, card_ids=card_ids, counts=counts)
+
+    def _roll_collectible_card_indices(self, faction: str, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        card_weights = self.card_weights_by_faction[faction]
+        remaining_cards = self.amount_cards - 1
+        amount_draws = min(remaining_cards, len(card_weights))
+        if amount_draws == 0:
+            if remaining_cards > 0:
+                raise ValueError(f"There are no cards with a weight greater than 0 for the faction {faction}")
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # Rolling card by card and setting the weight of a rolled card to 0 is the same as ordering the cards
+        # by exponential keys divided by their weights (Efraimidis-Spirakis), so all draws are done at once
+        keys = rng.standard_exponential(len(card_weights)) / card_weights
+        if amount_draws < len(card_weights):
+            card_indices = np.argpartition(keys, amount_draws - 1)[:amount_draws]
+        else:
+            card_indices = np.arange(len(card_weights))
+        card_indices = card_indices[np.argsort(keys[card_indices])]
+
+        # the count chances apply as long as at least 3 deck slots remain, the last one or two slots have their own rules
+        counts = self._roll_counts(self.count_values, self.count_cumulative_probabilities, rng.random(amount_draws))
+        filled_deck_slots = np.cumsum(counts)
+        if remaining_cards < 3:
+            amount_regular_counts = 0
+        else:
+            amount_regular_counts = min(amount_draws, 1 + int(np.searchsorted(filled_deck_slots[:-1], remaining_cards - 3, side="right")))
+        remaining_cards -= int(filled_deck_slots[amount_regular_counts - 1]) if amount_regular_counts > 0 else 0
+        last_counts: List[int] = []
+        while remaining_cards > 0:
+            if amount_regular_counts + len(last_counts) >= amount_draws:
+                raise ValueError(f"There are not enough cards with a weight greater than 0 for the faction {faction} to fill the deck")
+            if remaining_cards == 1:
+                count = 1
+            else:
+                count = int(self._roll_counts(self.count_values_two_remaining_deck_slots, self.count_cumulative_probabilities_two_remaining_deck_slots, rng.random(1))[0])
+            last_counts.append(count)
+            remaining_cards -= count
+        amount_rolled_cards = amount_regular_counts + len(last_counts)
+        counts = np.concatenate((counts[:amount_regular_counts], np.array(last_counts, dtype=np.int64)))
+        return card_indices[:amount_rolled_cards], counts
+
+    def _roll_collectible_card_indices_constructively(self, faction: str, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        '''Rolls card by card, while keeping track of the 1 and 2 drops, so the deck can always be completed within the limits
+
+        Rolling a card from all cards is the same as first rolling, if it is a 1 and 2 drop or not, based on the remaining
+        weights of both groups, and then taking the next card of that group in its Efraimidis-Spirakis order.
+        Groups and counts, that would make the limits unreachable, are skipped and the 1 and 2 drop group is tilted.
+        '''
+        card_weights = self.card_weights_by_faction[faction]
+        card_is_1_or_2_drop = self.card_is_1_or_2_drop_by_faction[faction]
+        keys = rng.standard_exponential(len(card_weights)) / card_weights
+        ordered_card_indices = np.argsort(keys)
+        ordered_1_and_2_drop_indices: List[int] = ordered_card_indices[card_is_1_or_2_drop[ordered_card_indices]].tolist()
+        ordered_other_indices: List[int] = ordered_card_indices[~card_is_1_or_2_drop[ordered_card_indices]].tolist()
+        remaining_1_and_2_drop_weights = np.cumsum(card_weights[ordered_1_and_2_drop_indices][::-1])[::-1].tolist() + [0.0]
+        remaining_other_weights = np.cumsum(card_weights[ordered_other_indices][::-1])[::-1].tolist() + [0.0]
+        tilt = self.constructive_1_and_2_drop_tilt_by_faction[faction]
+
+        remaining_cards = self.amount_cards - 1
+        amount_1_and_2_drops = 0
+        rolled_1_and_2_drops = 0
+        rolled_others = 0
+        card_indices: List[int] = []
+        counts: List[int] = []
+        # every card fills at least one deck slot, so two random numbers per deck slot are enough
+        uniform_random_numbers = iter(rng.random(2 * remaining_cards).tolist())
+        while remaining_cards > 0:
+            remaining_1_and_2_drop_cards = len(ordered_1_and_2_drop_indices) - rolled_1_and_2_drops
+            remaining_other_cards = len(ordered_other_indices) - rolled_others
+            if remaining_cards == 1:
+                count_chances = {1: 1.0}
+            elif remaining_cards == 2:
+                count_chances = self.count_chances_two_remaining_deck_slots
+            else:
+                count_chances = self.count_chances
+            count_chances_1_or_2_drop = {}
+            count_chances_other = {}
+            for count, chance in count_chances.items():
+                if count > remaining_cards:
+                    continue
+                if remaining_1_and_2_drop_cards > 0 and self._deck_can_be_completed(remaining_cards - count, amount_1_and_2_drops + count, remaining_1_and_2_drop_cards - 1, remaining_other_cards):
+                    count_chances_1_or_2_drop[count] = chance
+                if remaining_other_cards > 0 and self._deck_can_be_completed(remaining_cards - count, amount_1_and_2_drops, remaining_1_and_2_drop_cards, remaining_other_cards - 1):
+                    count_chances_other[count] = chance
+            weight_1_and_2_drops = tilt * remaining_1_and_2_drop_weights[rolled_1_and_2_drops] if count_chances_1_or_2_drop else 0.0
+            weight_others = remaining_other_weights[rolled_others] if count_chances_other else 0.0
+            if weight_1_and_2_drops + weight_others <= 0:
+                raise ValueError(f"The deck for faction {faction} can't be completed within the 1 and 2 drop limits")
+            if next(uniform_random_numbers) * (weight_1_and_2_drops + weight_others) < weight_1_and_2_drops:
+                card_indices.append(ordered_1_and_2_drop_indices[rolled_1_and_2_drops])
+                rolled_1_and_2_drops += 1
+                count = self._roll_count_from(count_chances_1_or_2_drop, next(uniform_random_numbers))
+                amount_1_and_2_drops += count
+            else:
+                card_indices.append(ordered_other_indices[rolled_others])
+                rolled_others += 1
+                count = self._roll_count_from(count_chances_other, next(uniform_random_numbers))
+            counts.append(count)
+            remaining_cards -= count
+        return np.array(card_indices, dtype=np.int64), np.array(counts, dtype=np.int64)
+
+    def _deck_can_be_completed(self, remaining_cards: int, amount_1_and_2_drops: int, remaining_1_and_2_drop_cards: int, remaining_other_cards: int) -> bool:
+        # every remaining card can fill 1 to 3 deck slots, so the final amount of 1 and 2 drops can be any number in this range
+        lowest_reachable = amount_1_and_2_drops + max(0, remaining_cards - 3 * remaining_other_cards)
+        highest_reachable = amount_1_and_2_drops + min(remaining_cards, 3 * remaining_1_and_2_drop_cards)
+        return max(lowest_reachable, self.lowest_amount_1_and_2_drops) <= min(highest_reachable, self.highest_amount_1_and_2_drops)
+
+    @staticmethod
+    def _roll_count_from(count_chances: Dict[int, float], uniform_random_number: float) -> int:
+        total_chance = sum(count_chances.values())
+        # counts without chance are only used, if no other count keeps the deck within the limits
+        if total_chance <= 0:
+            count_chances = {count: 1.0 for count in count_chances}
+            total_chance = len(count_chances)
+        threshold = uniform_random_number * total_chance
+        for count, chance in count_chances.items():
+            threshold -= chance
+            if threshold < 0:
+                return count
+        return count
+
+    @staticmethod
+    def _roll_counts(count_values: np.ndarray, count_cumulative_probabilities: np.ndarray, uniform_random_numbers: np.ndarray) -> np.ndarray:
+        count_indices = np.searchsorted(count_cumulative_probabilities, uniform_random_numbers, side="right")
+        return count_values[np.minimum(count_indices, len(count_values) - 1)]
+
+
+def deckcode_from_cards_and_counts(general_id: int, card_ids: np.ndarray, counts: np.ndarray) -> str:
+    '''Same deckcode as Deck.deckcode gives for a deck filled in the rolled order'''
+    return DeckCodec.encode([(general_id, 1), *zip(card_ids.tolist(), counts.tolist())])
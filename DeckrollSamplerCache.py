@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+import threading
+from DeckrollSampler import DeckrollSampler
+
+DECKROLL_SAMPLER_CACHE_SIZE = 32
+
+
+class DeckrollSamplerCache:
+    '''LRU cache of prepared DeckrollSamplers keyed by the normalized deckroll options
+
+    A sampler is only read while rolling, so one cached sampler can serve any amount of rolls. If more than max_size
+    samplers are cached, the least recently used one is evicted.
+    '''
+    def __init__(self, max_size: int = DECKROLL_SAMPLER_CACHE_SIZE) -> None:
+        if max_size < 0:
+            raise ValueError(f"The max_size of the deckroll sampler cache can not be negative, but is {max_size}")
+        self.max_size = max_size
+        self.samplers: OrderedDict[Hashable, DeckrollSampler] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, create_sampler: Callable[[], DeckrollSampler]) -> DeckrollSampler:
+        '''cached sampler of the key - create_sampler is called on a miss and a raised ValueError isn't cached'''
+        with self._lock:
+            sampler = self.samplers.get(key)
+            if sampler is not None:
+                self.samplers.move_to_end(key)
+                self.hits += 1
+                return sampler
+            self.misses += 1
+        sampler = create_sampler()
+        with self._lock:
+            if self.max_size > 0:
+                self.samplers[key] = sampler
+                self.samplers.move_to_end(key)
+                while len(self.samplers) > self.max_size:
+                    self.samplers.popitem(last=False)
+                    self.evictions += 1
+        return sampler
+
+    def clear(self) -> None:
+        with self._lock:
+            self.samplers.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.samplers),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
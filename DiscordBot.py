@@ -1,19 +1,46 @@
 from CardPool import CardPool
-from Deckroll import Deckroll, DECKROLL_ATTEMPTS, DECKROLL_MODIFICATION_NOT_GIVEN
+from DeckrollSampler import DeckrollSampler, deckcode_from_cards_and_counts
+from DeckrollSamplerCache import DeckrollSamplerCache, DECKROLL_SAMPLER_CACHE_SIZE
 import discord
-from copy import deepcopy
-import re
-from typing import Dict, Literal
-from CardData import RARITIES, MAIN_FACTIONS
-from tenacity import RetryError
+import numpy as np
+import asyncio
+import contextlib
+import functools
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, DefaultDict, Dict, Literal, Optional, Set, TypeVar
+from CardWeights import CardWeights
+from CommandOptions import CommandOptions
 import logging
+import logging.handlers
+import queue
+import atexit
 import textwrap
 from Draft import Draft, REACTIONS_NUMBERS
+from DraftMessageUpdateScheduler import DraftMessageUpdateScheduler
+from DraftStore import DraftStore, DraftStoreError, DraftState
+from Metrics import metrics, COMMAND_STAGE_DURATION
+from MetricsServer import MetricsServer
 from constants import DECKLINK_PREFIX, LEGACY_DECKLINK_PREFIX
 
-MAX_CARD_WEIGHT_CHANGE_FACTOR = 10000
-MAX_FACTION_WEIGHT = 100000
-MAX_CARDS = 100
+# rolls run in a thread pool, so they never block the event loop (and with it the gateway heartbeats)
+ROLL_WORKERS = 4
+ROLL_TIMEOUT_SECONDS = 10.0
+MAX_CONCURRENT_ROLLS_PER_USER = 1
+
+RollResult = TypeVar("RollResult")
+
+# drafts without any action of the user for this time are expired by the sweeper, which runs every interval -
+# if more drafts are live, the drafts with the oldest action are expired
+DRAFT_IDLE_TIMEOUT_SECONDS = 6 * 60 * 60
+DRAFT_SWEEP_INTERVAL_SECONDS = 5 * 60
+MAX_LIVE_DRAFTS = 500
+
+# the log file is rotated at this size, the last backups are kept as debug.log.1, debug.log.2, ...
+LOG_FILE = "debug.log"
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
 
 # Formatter, Stream Handler, File Handler, Logger
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -22,14 +49,25 @@ ch = logging.StreamHandler()
 ch.setLevel(logging.INFO)
 ch.setFormatter(formatter)
 
-fh = logging.FileHandler("debug.log")
+fh = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUP_COUNT)
 fh.setLevel(logging.DEBUG)
 fh.setFormatter(formatter)
 
+# the loggers only put the records into a queue, the writes to the console and the file are done by the listener
+# thread, so the event loop never waits for I/O
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, ch, fh, respect_handler_level=True)
+log_listener.start()
+# the queued records are written before the interpreter exits
+atexit.register(log_listener.stop)
+queue_handler = logging.handlers.QueueHandler(log_queue)
+
+# the queue handler is on the root logger, so the records of every module (and of discord.py) reach the listener
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(queue_handler)
+
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(ch)
-logger.addHandler(fh)
 
 class DiscordBot(discord.Client):
     def __init__(
@@ -38,16 +76,25 @@ class DiscordBot(discord.Client):
         legacy_card_pool: CardPool,
         amount_cards_default: int,
         factions_and_weights_default: Dict[Literal["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar"], int],
-        cards_and_weights_default: Dict[int, float],
-        legacy_cards_and_weights_default: Dict[int, float],
-        cards_and_weights_half_faction_half_neutral: Dict[int, float],
-        legacy_cards_and_weights_half_faction_half_neutral: Dict[int, float],
-        cards_and_weights_only_faction: Dict[int, float],
-        legacy_cards_and_weights_only_faction: Dict[int, float],
+        cards_and_weights_default: CardWeights,
+        legacy_cards_and_weights_default: CardWeights,
+        cards_and_weights_half_faction_half_neutral: CardWeights,
+        legacy_cards_and_weights_half_faction_half_neutral: CardWeights,
+        cards_and_weights_only_faction: CardWeights,
+        legacy_cards_and_weights_only_faction: CardWeights,
         count_chances_default: Dict[int, float],
         count_chances_two_remaining_deck_slots_default: Dict[int, float],
         min_1_and_2_drops_default: int,
         max_1_and_2_drops_default: int,
+        deckroll_sampler_cache_size: int = DECKROLL_SAMPLER_CACHE_SIZE,
+        roll_workers: int = ROLL_WORKERS,
+        roll_timeout: float = ROLL_TIMEOUT_SECONDS,
+        max_concurrent_rolls_per_user: int = MAX_CONCURRENT_ROLLS_PER_USER,
+        draft_store: Optional[DraftStore] = None,
+        draft_idle_timeout: float = DRAFT_IDLE_TIMEOUT_SECONDS,
+        draft_sweep_interval: float = DRAFT_SWEEP_INTERVAL_SECONDS,
+        max_live_drafts: int = MAX_LIVE_DRAFTS,
+        metrics_port: Optional[int] = None,
     ) -> None:
         self.card_pool = card_pool
         self.legacy_card_pool = legacy_card_pool
@@ -67,7 +114,45 @@ class DiscordBot(discord.Client):
         self.card_offers_per_pick_default = 3
         self.cards_to_choose_per_pick_default = 1
         self.card_bucket_size_default = 1
-        self.drafts: Dict[int, Draft] = {}
+        self.default_options = CommandOptions(
+            amount_cards=self.amount_cards_default,
+            factions_and_weights=self.factions_and_weights_default,
+            count_chances=self.count_chances_default,
+            count_chances_two_remaining_deck_slots=self.count_chances_two_remaining_deck_slots_default,
+            min_1_and_2_drops=self.min_1_and_2_drops_default,
+            max_1_and_2_drops=self.max_1_and_2_drops_default,
+            faction_offers=self.faction_offers_default,
+            card_offers_per_pick=self.card_offers_per_pick_default,
+            cards_to_choose_per_pick=self.cards_to_choose_per_pick_default,
+            card_bucket_size=self.card_bucket_size_default,
+        )
+        # ordered from the least to the most recently active draft
+        self.drafts: OrderedDict[int, Draft] = OrderedDict()
+        # user id -> message id of the ongoing draft of the user, kept in sync with drafts by _add_draft and _remove_draft
+        self.draft_message_ids_by_user: Dict[int, int] = {}
+        # coalesces the message edits of all drafts
+        self.draft_message_update_scheduler = DraftMessageUpdateScheduler()
+        # the ongoing drafts are saved on every pick and restored on the start of the bot
+        self.draft_store = draft_store
+        self.drafts_restored = False
+        self.draft_idle_timeout = draft_idle_timeout
+        self.draft_sweep_interval = draft_sweep_interval
+        self.max_live_drafts = max_live_drafts
+        # started in setup_hook and cancelled in close
+        self.draft_sweeper: Optional[asyncio.Task] = None
+        self.expired_drafts = 0
+        self.evicted_drafts = 0
+        # the tasks expiring evicted drafts are referenced until they are done, so they aren't garbage collected mid-run
+        self.expire_draft_tasks: Set[asyncio.Task] = set()
+        # prepared samplers of recently used deckroll options, so repeated options skip the setup
+        self.deckroll_sampler_cache = DeckrollSamplerCache(max_size=deckroll_sampler_cache_size)
+        self.roll_executor = ThreadPoolExecutor(max_workers=roll_workers, thread_name_prefix="roll")
+        self.roll_timeout = roll_timeout
+        self.max_concurrent_rolls_per_user = max_concurrent_rolls_per_user
+        self.rolls_in_progress_by_user: DefaultDict[int, int] = defaultdict(lambda: 0)
+        # latencies are recorded into the shared metrics, the gauges of the bot are collected on every scrape
+        metrics.register_collector(self._collect_metrics)
+        self.metrics_server = MetricsServer(port=metrics_port) if metrics_port is not None else None
 
         # START DISCORD BOT
         with open("discord_bot_token.key") as file:
@@ -76,16 +161,46 @@ class DiscordBot(discord.Client):
         intents.message_content = True
         intents.members = True
         super().__init__(intents=intents)
-        self.run(token=token)
+        # discord.py logs through the root logger instead of adding its own console handler
+        self.run(token=token, log_handler=None)
+
+    async def close(self) -> None:
+        await super().close()
+        # the sweeper must not touch the draft store after it is closed
+        if self.draft_sweeper is not None:
+            self.draft_sweeper.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.draft_sweeper
+        self.roll_executor.shutdown(wait=False, cancel_futures=True)
+        if self.draft_store is not None:
+            self.draft_store.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+
+    async def setup_hook(self) -> None:
+        self.draft_sweeper = asyncio.create_task(self._sweep_drafts())
+        if self.metrics_server is not None:
+            # the bot runs without the metrics endpoint, if e.g. the port is already in use
+            try:
+                self.metrics_server.start()
+            except OSError as e:
+                logger.warning("The metrics can't be served on http://%s:%d/metrics: %s", self.metrics_server.host, self.metrics_server.port, e)
+                self.metrics_server = None
+            else:
+                logger.info("Serving metrics on http://%s:%d/metrics", self.metrics_server.host, self.metrics_server.port)
 
     async def on_ready(self):
+        # on_ready is called again after reconnects, but the drafts are only restored once
+        if not self.drafts_restored:
+            self.drafts_restored = True
+            await self._restore_drafts()
         logger.info("I am ready to start rolling!")
 
     async def on_message(self, message: discord.Message):
         if isinstance(message.content, str):
             message_content: str = message.content.lower()
             if message_content.startswith("!deckroll") or message_content.startswith("!draft"):
-                logger.info(f"Message from {message.author}: {message_content}")
+                logger.info("Message from %s: %s", message.author, message_content)
 
             # DECKROLL HELP
             if message_content == "!deckroll help":
@@ -107,7 +222,7 @@ class DiscordBot(discord.Client):
 
                 this default deckroll can be indivualized with the following modifications (combine them as you want,
                 but wrong inputs and e.g. excluding all cards will return an error or just give no response,
-                also if the modification doesn't get noticed by the input parser it just gets ignored):
+                unknown modifications are reported and ignored, modifications are separated by spaces):
                 - "legacy" for legacy card pool 
                 - cards=<number> --> cards=60
                 - change faction weights (standard weight is 1) with <faction-name>=<number>
@@ -123,7 +238,10 @@ class DiscordBot(discord.Client):
                 - count-chances-two-remaining-deck-slots=<number>/<number> --> count-chances-two-remaining-deck-slots=50/50 (1/2 ofs)
                 - min-1-and-2-drops=<number>
                 - max-1-and-2-drops=<number>
-                (the deck is still created at random, the deck roll will roll a deck up to 100 times and afterwards check for number of 1 and 2 cost units)
+                (the deck is still created at random, the deck roll will roll a deck up to 100 times and check for number of 1 and 2 cost units,
+                afterwards the deck is rolled card by card while keeping the number of 1 and 2 cost units within the limits -
+                if the limits are too unlikely to be hit by the 100 rolls, the deck is rolled card by card right away
+                and impossible limits are reported together with the possible range)
                 """
                 embed = discord.Embed(
                     title=title, description=help_message, color=0xF90202
@@ -132,45 +250,21 @@ class DiscordBot(discord.Client):
 
             # DECKROLL
             elif message_content.startswith("!deckroll"):
-                legacy = await self._get_format(message_content=message_content)
-                if legacy:
-                    cards_and_weights = deepcopy(self.legacy_cards_and_weights_default)
-                    card_pool = self.legacy_card_pool
-                else:
-                    cards_and_weights = deepcopy(self.cards_and_weights_default)
-                    card_pool = self.card_pool
-
-                amount_cards = await self._get_amount_cards(message_content=message_content, message=message)
-                cards_and_weights = await self._get_cards_and_weights(message_content=message_content, message=message, legacy=legacy)
-                await self._change_card_weights_based_on_their_rarity(message_content=message_content, message=message, cards_and_weights=cards_and_weights, card_pool=card_pool)
-                factions_and_weights = await self._get_factions_and_weights(message_content=message_content, message=message)
-                count_chances = await self._get_count_chances(message_content=message_content, message=message)
-                count_chances_two_remaining_deck_slots = await self._get_count_chances_two_remaining_deck_slots(message_content=message_content, message=message)
-                min_1_and_2_drops = await self._get_min_1_and_2_drops(message_content=message_content, message=message, amount_cards=amount_cards)
-                max_1_and_2_drops = await self._get_max_1_and_2_drops(message_content=message_content, message=message, min_1_and_2_drops=min_1_and_2_drops)
-                        
-                deck_roll = Deckroll(
-                    card_pool=card_pool,
-                    amount_cards=amount_cards,
-                    factions_and_weights=factions_and_weights,
-                    cards_and_weights=cards_and_weights,
-                    count_chances=count_chances,
-                    count_chances_two_remaining_deck_slots=count_chances_two_remaining_deck_slots,
-                    min_1_and_2_drops=min_1_and_2_drops,
-                    max_1_and_2_drops=max_1_and_2_drops,
-                    )
-
-                try:
-                    deckcode = deck_roll.roll_deck()
-                except RetryError as e:
-                    await message.channel.send(f"Even after {DECKROLL_ATTEMPTS} rolls no valid deck could be rolled for the given settings")
-                    raise RetryError(f"Even after {DECKROLL_ATTEMPTS} rolls no valid deck could be rolled for the given settings")
-                logger.info(f"the deckroll gave:  {deckcode}")
-                
-                if legacy:
-                    await message.channel.send(LEGACY_DECKLINK_PREFIX + deckcode)
-                else:
-                    await message.channel.send(DECKLINK_PREFIX + deckcode)
+                with metrics.time(COMMAND_STAGE_DURATION, command="deckroll", stage="total"):
+                    options = await self._get_options(message_content=message_content, message=message, command="deckroll")
+                    try:
+                        deckcode = await self._run_roll(message=message, roll=functools.partial(self._roll_deckcode, options=options))
+                    except ValueError as e:
+                        error = f"No valid deck could be rolled for the given settings: {e}"
+                        await message.channel.send(error)
+                        raise ValueError(error)
+                    logger.info("the deckroll gave:  %s", deckcode)
+                    
+                    with metrics.time(COMMAND_STAGE_DURATION, command="deckroll", stage="discord_send"):
+                        if options.legacy:
+                            await message.channel.send(LEGACY_DECKLINK_PREFIX + deckcode)
+                        else:
+                            await message.channel.send(DECKLINK_PREFIX + deckcode)
 
             # DRAFT HELP
             elif message_content == "!draft help":
@@ -183,7 +277,7 @@ class DiscordBot(discord.Client):
 
                 the default draft (!draft) can be indivualized with the following modifications
                 (combine them as you want, but wrong inputs and e.g. excluding all cards will return an error or just give no response,
-                also if the modification doesn't get noticed by the input parser it just gets ignored):
+                unknown modifications are reported and ignored, modifications are separated by spaces):
                 the deckroll modifications can be usedif they make sense in the context of drafting
                 --> use "!deckroll help" to get more information
                 Additionally the following modifications are possible:
@@ -203,61 +297,66 @@ class DiscordBot(discord.Client):
 
             # ABANDON DRAFT
             elif message_content == "!abandon draft":
-                message_id_of_ongoing_draft = False
-                for message_id, draft in self.drafts.items():
-                    if draft.user == message.author:
-                        message_id_of_ongoing_draft = message_id
-                if  message_id_of_ongoing_draft:
-                    await self.drafts[message_id].abandon()
-                    del self.drafts[message_id]
+                draft = self._get_ongoing_draft(user=message.author)
+                if draft is not None:
+                    self._remove_draft(draft=draft)
+                    await draft.abandon()
 
             # DRAFT
             elif message_content.startswith("!draft"):
-                user_has_ongoing_draft = False
-                for draft in self.drafts.values():
-                    if draft.user == message.author:
-                        user_has_ongoing_draft = True
-                        await message.channel.send(content=textwrap.dedent(f"""
-                            You have an already ongoing draft!
-                            You can go to the draft message with this link ({draft.draft_message.jump_url})
-                            or abandon that draft with the command:
-                            !abandon draft
-                        """))
-                if not user_has_ongoing_draft:
-                    # DECKROLL OPTIONS
-                    legacy = await self._get_format(message_content=message_content)
-                    if legacy:
-                        cards_and_weights = deepcopy(self.legacy_cards_and_weights_default)
-                        card_pool = self.legacy_card_pool
-                    else:
-                        cards_and_weights = deepcopy(self.cards_and_weights_default)
-                        card_pool = self.card_pool
-
-                    amount_cards = await self._get_amount_cards(message_content=message_content, message=message)
-                    cards_and_weights = await self._get_cards_and_weights(message_content=message_content, message=message, legacy=legacy)
-                    await self._change_card_weights_based_on_their_rarity(message_content=message_content, message=message, cards_and_weights=cards_and_weights, card_pool=card_pool)
-                    factions_and_weights = await self._get_factions_and_weights(message_content=message_content, message=message)
-
-                    # DRAFT OPTIONS
-                    faction_offers = await self._get_faction_offers(message_content=message_content, message=message)
-                    card_offers_per_pick = await self._get_card_offers_per_pick(message_content=message_content, message=message)
-                    cards_to_choose_per_pick = await self._get_cards_to_choose_per_pick(message_content=message_content, message=message, card_offers_per_pick=card_offers_per_pick)
-                    card_bucket_size = await self._get_card_bucket_size(message_content=message_content, message=message, cards_to_choose_per_pick=cards_to_choose_per_pick)
-
-                    draft_message = await message.channel.send(content="Let's start drafting :)")
-                    self.drafts[draft_message.id] = Draft(draft_init_message_content=message_content, draft_message=draft_message, discord_bot_user=self.user, user=message.author, card_pool=card_pool, amount_cards=amount_cards, factions_and_weights=factions_and_weights, cards_and_weights=cards_and_weights, faction_offers=faction_offers, card_offers_per_pick=card_offers_per_pick, cards_to_choose_per_pick=cards_to_choose_per_pick, card_bucket_size=card_bucket_size)
-                    await self.drafts[draft_message.id].start_draft()
+                draft = self._get_ongoing_draft(user=message.author)
+                if draft is not None:
+                    await message.channel.send(content=textwrap.dedent(f"""
+                        You have an already ongoing draft!
+                        You can go to the draft message with this link ({draft.draft_message.jump_url})
+                        or abandon that draft with the command:
+                        !abandon draft
+                    """))
+                else:
+                    with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="total"):
+                        await self._start_draft(message_content=message_content, message=message)
+
+    async def _start_draft(self, message_content: str, message: discord.Message) -> None:
+        options = await self._get_options(message_content=message_content, message=message, command="draft")
+        card_pool = self.legacy_card_pool if options.legacy else self.card_pool
+        cards_and_weights = self._get_cards_and_weights(options=options)
+
+        with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="discord_send"):
+            draft_message = await message.channel.send(content="Let's start drafting :)")
+        draft = Draft(draft_init_message_content=message_content, draft_message=draft_message, discord_bot_user=self.user, user=message.author, card_pool=card_pool, amount_cards=options.amount_cards, factions_and_weights=options.factions_and_weights, cards_and_weights=cards_and_weights, faction_offers=options.faction_offers, card_offers_per_pick=options.card_offers_per_pick, cards_to_choose_per_pick=options.cards_to_choose_per_pick, card_bucket_size=options.card_bucket_size, executor=self.roll_executor, roll_timeout=self.roll_timeout, update_scheduler=self.draft_message_update_scheduler)
+        self._add_draft(draft=draft)
+        try:
+            await draft.start_draft()
+        except TimeoutError:
+            # the draft cancelled itself
+            self._remove_draft(draft=draft)
+            raise
+        self._save_draft(draft=draft)
 
     async def on_reaction_add(self, reaction: discord.Reaction, user: discord.User):
         if user != self.user and reaction.emoji in REACTIONS_NUMBERS.keys() and reaction.message.id in self.drafts.keys() and user == self.drafts[reaction.message.id].user:
-            # Prevents the user to add reaction, that are out of bounds for the current choices
-            if REACTIONS_NUMBERS[reaction.emoji] >= len(self.drafts[reaction.message.id].current_choices):
-                await reaction.remove(user)
-            else:
-                draft_finished = await self.drafts[reaction.message.id].user_adds_reaction(reaction=reaction)
-                await self.drafts[reaction.message.id].update_draft_message()
+            draft = self.drafts[reaction.message.id]
+            # a reaction is handled only after the previous one of the draft is done, so it never sees a half-made pick
+            async with draft.reaction_lock:
+                # the draft can end while the reaction waits
+                if self.drafts.get(reaction.message.id) is not draft:
+                    return
+                # Prevents the user to add reaction, that are out of bounds for the current choices
+                if REACTIONS_NUMBERS[reaction.emoji] >= len(draft.current_choices):
+                    await reaction.remove(user)
+                    return
+                self.drafts.move_to_end(reaction.message.id)
+                with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="reaction"):
+                    try:
+                        draft_finished = await draft.user_adds_reaction(reaction=reaction)
+                    except TimeoutError:
+                        # the draft cancelled itself
+                        self._remove_draft(draft=draft)
+                        raise
                 if draft_finished:
-                    del self.drafts[reaction.message.id]
+                    self._remove_draft(draft=draft)
+                else:
+                    self._save_draft(draft=draft)
             
 
         # Prevents other users to add emojis and other emojis to be added to drafting messages
@@ -269,186 +368,200 @@ class DiscordBot(discord.Client):
             if reaction in self.drafts[reaction.message.id].current_reactions:
                 self.drafts[reaction.message.id].current_reactions.remove(reaction)
 
-    async def _get_format(self, message_content: str) -> bool:
-        return True if "legacy" in message_content else False
-
-    async def _get_amount_cards(self, message_content: str, message: discord.Message) -> int:
-        amount_cards = self.amount_cards_default
-        amount_cards_regex = r".*cards=(\d+).*"
-        amount_cards_regex_match = re.match(amount_cards_regex, message_content)
-        if bool(amount_cards_regex_match):
-            amount_cards = int(amount_cards_regex_match.group(1))
-            if amount_cards < 1:
-                error = f"detected a given amount of cards of {amount_cards}, but the amount of cards can not be less than 1!"
-                await message.channel.send(error)
-                raise ValueError(error)
-            if amount_cards > MAX_CARDS:
-                error = f"detected a given amount of cards of {amount_cards}, but the amount of cards can not be greater than {MAX_CARDS}!"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return amount_cards
-    
-    async def _get_factions_and_weights(self, message_content: str, message: discord.Message) -> Dict[str, int]:
-        factions_and_weights = deepcopy(self.factions_and_weights_default)
-        for faction_name in MAIN_FACTIONS:
-            faction_weight_change_regex = rf".*{faction_name.lower()}=(\d+).*"
-            faction_weight_change_regex_match = re.match(faction_weight_change_regex, message_content)
-            if bool(faction_weight_change_regex_match):
-                faction_weight_change = int(faction_weight_change_regex_match.group(1))
-                factions_and_weights[faction_name] = faction_weight_change
-                if faction_weight_change > MAX_FACTION_WEIGHT:
-                    error = f"detected faction weight change for faction {faction_name} with the value {faction_weight_change} - only values between 0 and {MAX_FACTION_WEIGHT} are allowed."
-                    await message.channel.send(error)
-                    raise ValueError(error)
-        return factions_and_weights
-    
-    async def _get_cards_and_weights(self, message_content: str, message: discord.Message, legacy: bool) -> Dict[int, float]:
+    def _get_ongoing_draft(self, user: discord.User) -> Optional[Draft]:
+        draft_message_id = self.draft_message_ids_by_user.get(user.id)
+        if draft_message_id is None:
+            return None
+        return self.drafts[draft_message_id]
+
+    def _add_draft(self, draft: Draft) -> None:
+        self.drafts[draft.draft_message.id] = draft
+        self.draft_message_ids_by_user[draft.user.id] = draft.draft_message.id
+        # over the limit the least recently active drafts are expired
+        while len(self.drafts) > self.max_live_drafts:
+            least_recently_active_draft = next(iter(self.drafts.values()))
+            self.evicted_drafts += 1
+            self._remove_draft(draft=least_recently_active_draft)
+            expire_draft_task = asyncio.create_task(self._expire_draft(draft=least_recently_active_draft))
+            self.expire_draft_tasks.add(expire_draft_task)
+            expire_draft_task.add_done_callback(self.expire_draft_tasks.discard)
+
+    def _remove_draft(self, draft: Draft) -> None:
+        logger.info("%s's draft ended after %d picks with %.2f REST calls per pick %s", draft.user.name, draft.picks, draft.rest_calls_per_pick, dict(draft.rest_calls))
+        # both maps only lose the draft, if it is still the registered one
+        if self.drafts.get(draft.draft_message.id) is draft:
+            del self.drafts[draft.draft_message.id]
+        if self.draft_message_ids_by_user.get(draft.user.id) == draft.draft_message.id:
+            del self.draft_message_ids_by_user[draft.user.id]
+        if self.draft_store is not None:
+            self.draft_store.delete(draft_message_id=draft.draft_message.id)
+
+    async def _sweep_drafts(self) -> None:
+        while True:
+            await asyncio.sleep(self.draft_sweep_interval)
+            # an error in one sweep must not end the sweeper, the next sweep tries again
+            try:
+                idle_since = time.monotonic() - self.draft_idle_timeout
+                idle_drafts = [draft for draft in self.drafts.values() if draft.last_activity < idle_since]
+                for draft in idle_drafts:
+                    self.expired_drafts += 1
+                    self._remove_draft(draft=draft)
+                for draft in idle_drafts:
+                    await self._expire_draft(draft=draft)
+                logger.info("Draft metrics: %s", self.draft_metrics)
+            except Exception:
+                logger.exception("Sweeping the idle drafts failed")
+
+    async def _expire_draft(self, draft: Draft) -> None:
+        try:
+            await draft.expire()
+        except discord.HTTPException as e:
+            logger.warning("Expiring %s's draft failed: %s", draft.user.name, e)
+
+    @property
+    def draft_metrics(self) -> Dict[str, int]:
+        # also read by the metrics server thread - list() copies the drafts at once, while the event loop may change them
+        drafts = list(self.drafts.values())
+        return {
+            "live_drafts": len(drafts),
+            "live_drafts_memory_bytes": sum(draft.approximate_memory_bytes for draft in drafts),
+            "expired_drafts": self.expired_drafts,
+            "evicted_drafts": self.evicted_drafts,
+        }
+
+    def _collect_metrics(self) -> Dict[str, float]:
+        draft_metrics = self.draft_metrics
+        deckroll_sampler_cache_stats = self.deckroll_sampler_cache.stats
+        return {
+            "live_drafts": draft_metrics["live_drafts"],
+            "live_drafts_memory_bytes": draft_metrics["live_drafts_memory_bytes"],
+            "expired_drafts_total": draft_metrics["expired_drafts"],
+            "evicted_drafts_total": draft_metrics["evicted_drafts"],
+            "rolls_in_progress": sum(list(self.rolls_in_progress_by_user.values())),
+            "sampler_cache_size": deckroll_sampler_cache_stats["size"],
+            "sampler_cache_hits_total": deckroll_sampler_cache_stats["hits"],
+            "sampler_cache_misses_total": deckroll_sampler_cache_stats["misses"],
+            "sampler_cache_evictions_total": deckroll_sampler_cache_stats["evictions"],
+            "draft_message_updates_requested_total": self.draft_message_update_scheduler.requested_updates,
+            "draft_message_updates_performed_total": self.draft_message_update_scheduler.performed_updates,
+        }
+
+    def _save_draft(self, draft: Draft) -> None:
+        # a draft, that ended in the meantime, must not be saved again
+        if self.draft_store is not None and self.drafts.get(draft.draft_message.id) is draft:
+            self.draft_store.save(draft_state=draft.to_state())
+
+    async def _restore_drafts(self) -> None:
+        if self.draft_store is None:
+            return
+        try:
+            draft_states = await self.draft_store.load_all()
+        except DraftStoreError:
+            logger.exception("Loading the ongoing drafts failed, no draft is restored")
+            return
+        for draft_state in draft_states:
+            # a draft, that can't be restored (deleted message, missing permissions, cards missing in the card pool, ...),
+            # is deleted, so it doesn't prevent the other drafts and the start of the bot
+            try:
+                draft = await self._restore_draft(draft_state=draft_state)
+                await draft.update_draft_message()
+            except (discord.NotFound, discord.Forbidden) as e:
+                logger.info("The draft %s can't be restored and is deleted: %s", draft_state["draft_message_id"], e)
+                self.draft_store.delete(draft_message_id=draft_state["draft_message_id"])
+                continue
+            except (KeyError, TypeError, ValueError):
+                # the saved state doesn't fit Draft.from_state or the card pool anymore
+                logger.exception("The state of the draft %s can't be restored, it is deleted", draft_state.get("draft_message_id"))
+                if "draft_message_id" in draft_state:
+                    self.draft_store.delete(draft_message_id=draft_state["draft_message_id"])
+                continue
+            except discord.HTTPException:
+                # e.g. discord being unavailable - the draft is kept and restored on the next start
+                logger.exception("Restoring the draft %s failed, it is kept", draft_state["draft_message_id"])
+                continue
+            self._add_draft(draft=draft)
+        logger.info("Restored %d ongoing drafts", len(self.drafts))
+
+    async def _restore_draft(self, draft_state: DraftState) -> Draft:
+        channel = self.get_channel(draft_state["channel_id"]) or await self.fetch_channel(draft_state["channel_id"])
+        draft_message = await channel.fetch_message(draft_state["draft_message_id"])
+        user = await self.fetch_user(draft_state["user_id"])
+        draft = Draft.from_state(state=draft_state, draft_message=draft_message, discord_bot_user=self.user, user=user, card_pool=self.legacy_card_pool if draft_state["legacy"] else self.card_pool, executor=self.roll_executor, roll_timeout=self.roll_timeout, update_scheduler=self.draft_message_update_scheduler)
+        # picks of the user, that were made while the bot was offline, are lost - their reactions are removed, so they can be made again
+        for reaction in draft_message.reactions:
+            if reaction.count > (1 if reaction.me else 0):
+                await reaction.remove(user)
+        return draft
+
+    async def _get_options(self, message_content: str, message: discord.Message, command: str) -> CommandOptions:
+        try:
+            with metrics.time(COMMAND_STAGE_DURATION, command=command, stage="parse"):
+                options = CommandOptions.parse(message_content=message_content, defaults=self.default_options)
+        except ValueError as e:
+            error = str(e)
+            await message.channel.send(error)
+            raise ValueError(error)
+        if options.unknown_options:
+            unknown_options = ", ".join(options.unknown_options)
+            logger.info("Ignored unknown options: %s", unknown_options)
+            await message.channel.send(f"The following options are unknown and got ignored: {unknown_options}")
+        return options
+
+    async def _run_roll(self, message: discord.Message, roll: Callable[[], RollResult]) -> RollResult:
+        '''runs the roll in the roll executor - limited per user and cancelled after the roll timeout'''
+        user_id = message.author.id
+        if self.rolls_in_progress_by_user[user_id] >= self.max_concurrent_rolls_per_user:
+            error = f"You already have {self.rolls_in_progress_by_user[user_id]} roll(s) in progress, please wait until they are finished"
+            await message.channel.send(error)
+            raise RuntimeError(error)
+        self.rolls_in_progress_by_user[user_id] += 1
+        try:
+            return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(self.roll_executor, roll), timeout=self.roll_timeout)
+        except asyncio.TimeoutError:
+            # the worker thread can't be interrupted, but its result is dropped and the event loop moves on
+            error = f"The roll took longer than {self.roll_timeout} seconds and was cancelled"
+            await message.channel.send(error)
+            raise TimeoutError(error)
+        finally:
+            self.rolls_in_progress_by_user[user_id] -= 1
+            if self.rolls_in_progress_by_user[user_id] == 0:
+                del self.rolls_in_progress_by_user[user_id]
+
+    def _roll_deckcode(self, options: CommandOptions) -> str:
+        # runs in the roll executor - the cached sampler is shared, so every roll gets its own generator
+        with metrics.time(COMMAND_STAGE_DURATION, command="deckroll", stage="weight_prep"):
+            deckroll_sampler = self._get_deckroll_sampler(options=options)
+        with metrics.time(COMMAND_STAGE_DURATION, command="deckroll", stage="sample"):
+            _, general_id, card_ids, counts = deckroll_sampler.roll_deck(np.random.default_rng())
+        with metrics.time(COMMAND_STAGE_DURATION, command="deckroll", stage="render"):
+            return deckcode_from_cards_and_counts(general_id=general_id, card_ids=card_ids, counts=counts)
+
+    def _get_deckroll_sampler(self, options: CommandOptions) -> DeckrollSampler:
+        def create_deckroll_sampler() -> DeckrollSampler:
+            return DeckrollSampler(
+                card_pool=self.legacy_card_pool if options.legacy else self.card_pool,
+                amount_cards=options.amount_cards,
+                factions_and_weights=options.factions_and_weights,
+                cards_and_weights=self._get_cards_and_weights(options=options),
+                count_chances=options.count_chances,
+                count_chances_two_remaining_deck_slots=options.count_chances_two_remaining_deck_slots,
+                min_1_and_2_drops=options.min_1_and_2_drops,
+                max_1_and_2_drops=options.max_1_and_2_drops,
+            )
+        deckroll_sampler = self.deckroll_sampler_cache.get_or_create(key=options.deckroll_key(), create_sampler=create_deckroll_sampler)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Deckroll sampler cache: %s", self.deckroll_sampler_cache.stats)
+        return deckroll_sampler
+
+    def _get_cards_and_weights(self, options: CommandOptions) -> CardWeights:
         # default: all cards are equally likely
-        if legacy:
-            cards_and_weights = deepcopy(self.legacy_cards_and_weights_default)
+        if options.card_weights_preset == "half-faction-half-neutral":
+            preset = self.legacy_cards_and_weights_half_faction_half_neutral if options.legacy else self.cards_and_weights_half_faction_half_neutral
+        elif options.card_weights_preset == "only-faction":
+            preset = self.legacy_cards_and_weights_only_faction if options.legacy else self.cards_and_weights_only_faction
         else:
-            cards_and_weights = deepcopy(self.cards_and_weights_default)
-        # half-faction-half-neutral
-        if "half-faction-half-neutral" in message_content:
-            if legacy:
-                cards_and_weights = deepcopy(self.legacy_cards_and_weights_half_faction_half_neutral)
-            else:
-                cards_and_weights = deepcopy(self.cards_and_weights_half_faction_half_neutral)
-        # only faction
-        elif "only-faction" in message_content:
-            if legacy:
-                cards_and_weights = deepcopy(self.legacy_cards_and_weights_only_faction)
-            else:
-                cards_and_weights = deepcopy(self.cards_and_weights_only_faction)
-        return cards_and_weights
-    
-    async def _change_card_weights_based_on_their_rarity(self, message_content: str, message: discord.Message, cards_and_weights: Dict[str, int], card_pool: CardPool) -> None:
-        for rarity in RARITIES:
-            card_weight_change_regex = rf".*{rarity.lower()}=(\d+).*"
-            card_weight_change_regex_match = re.match(card_weight_change_regex, message_content)
-            if bool(card_weight_change_regex_match):
-                card_weight_change_factor = int(card_weight_change_regex_match.group(1))
-                if card_weight_change_factor > MAX_CARD_WEIGHT_CHANGE_FACTOR:
-                    error = f"detected card weight change for rarity {rarity} with the value {card_weight_change_factor} - only values between 0 and {MAX_CARD_WEIGHT_CHANGE_FACTOR} are allowed."
-                    await message.channel.send(error)
-                    raise ValueError(error)
-                for collectible_card in card_pool.collectible_cards:
-                    if collectible_card.rarity.lower() == rarity.lower():
-                        cards_and_weights[collectible_card.id] *= card_weight_change_factor
-
-    async def _get_count_chances(self, message_content: str, message: discord.Message) -> Dict[int, int]:
-        count_chances = deepcopy(self.count_chances_default)
-        count_chances_regex = r".*count-chances=(\d+)/(\d+)/(\d+).*"
-        count_chances_regex_match = re.match(count_chances_regex, message_content)
-        if bool(count_chances_regex_match):
-            count_chances_one_ofs = int(count_chances_regex_match.group(1))
-            count_chances_two_ofs = int(count_chances_regex_match.group(2))
-            count_chances_three_ofs = int(count_chances_regex_match.group(3))
-            count_chances = {
-                1: count_chances_one_ofs,
-                2: count_chances_two_ofs,
-                3: count_chances_three_ofs,
-            }
-            if (sum(list(count_chances.values())) != 100):
-                error = f"detected count-chances (1/2/3 ofs) {count_chances_one_ofs}/{count_chances_two_ofs}/{count_chances_three_ofs} -- the chances must sum up to 100!"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return count_chances
-    
-    async def _get_count_chances_two_remaining_deck_slots(self, message_content: str, message: discord.Message) -> Dict[int, int]:
-        count_chances_two_remaining_deck_slots = deepcopy(self.count_chances_two_remaining_deck_slots_default)
-        count_chances_two_remaining_deck_slots_regex = r".*count-chances-two-remaining-deck-slots=(\d+)/(\d+).*"
-        count_chances_two_remaining_deck_slots_regex_match = re.match(count_chances_two_remaining_deck_slots_regex, message_content)
-        if bool(count_chances_two_remaining_deck_slots_regex_match):
-            count_chances_two_remaining_deck_slots_one_ofs = int(count_chances_two_remaining_deck_slots_regex_match.group(1))
-            count_chances_two_remaining_deck_slots_two_ofs = int(count_chances_two_remaining_deck_slots_regex_match.group(2))
-            count_chances_two_remaining_deck_slots = {
-                1: count_chances_two_remaining_deck_slots_one_ofs,
-                2: count_chances_two_remaining_deck_slots_two_ofs,
-            }
-            if (sum(list(count_chances_two_remaining_deck_slots.values())) != 100):
-                error = f"detected count-chances-two-remaining-deck-slots (1/2 ofs) {count_chances_two_remaining_deck_slots_one_ofs}/{count_chances_two_remaining_deck_slots_two_ofs} -- the chances must sum up to 100!"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return count_chances_two_remaining_deck_slots
-    
-    async def _get_min_1_and_2_drops(self, message_content: str, message: discord.Message, amount_cards: int) -> int:
-        min_1_and_2_drops = DECKROLL_MODIFICATION_NOT_GIVEN
-        min_1_and_2_drops_regex = r".*min-1-and-2-drops=(\d+).*"
-        min_1_and_2_drops_regex_regex_match = re.match(min_1_and_2_drops_regex, message_content)
-        if bool(min_1_and_2_drops_regex_regex_match):
-            min_1_and_2_drops = int(min_1_and_2_drops_regex_regex_match.group(1))
-            if min_1_and_2_drops > amount_cards:
-                error = f"The given amount of minimum 1 and 2 drops ({min_1_and_2_drops}) is higher than the given amount of total cards in the deck ({amount_cards})"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return min_1_and_2_drops
-    
-    async def _get_max_1_and_2_drops(self, message_content: str, message: discord.Message, min_1_and_2_drops: int) -> int:
-        max_1_and_2_drops = DECKROLL_MODIFICATION_NOT_GIVEN
-        max_1_and_2_drops_regex = r".*max-1-and-2-drops=(\d+).*"
-        max_1_and_2_drops_regex_regex_match = re.match(max_1_and_2_drops_regex, message_content)
-        if bool(max_1_and_2_drops_regex_regex_match):
-            max_1_and_2_drops = int(max_1_and_2_drops_regex_regex_match.group(1))
-            if max_1_and_2_drops < min_1_and_2_drops:
-                error = f"The given amount of minimum 1 and 2 drops ({min_1_and_2_drops}) is higher than the given amount of maximum 1 and 2 drops ({max_1_and_2_drops})"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return max_1_and_2_drops
-    
-    # DRAFTING MODIFICATIONS
-    async def _get_faction_offers(self, message_content: str, message: discord.Message) -> int:
-        faction_offers = self.faction_offers_default
-        faction_offers_regex = r".*faction-offers=(\d+).*"
-        faction_offers_regex_match = re.match(faction_offers_regex, message_content)
-        if bool(faction_offers_regex_match):
-            faction_offers = int(faction_offers_regex_match.group(1))
-            if faction_offers < 1 or faction_offers > 6:
-                error = f"detected a given amount of faction_offers of {faction_offers}, but the amount of region_offers_per_pick has to be between 1 and 6!"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return faction_offers
-    
-    async def _get_card_offers_per_pick(self, message_content: str, message: discord.Message) -> int:
-        card_offers_per_pick = self.card_offers_per_pick_default
-        card_offers_per_pick_regex = r".*card-offers-per-pick=(\d+).*"
-        card_offers_per_pick_regex_match = re.match(card_offers_per_pick_regex, message_content)
-        if bool(card_offers_per_pick_regex_match):
-            card_offers_per_pick = int(card_offers_per_pick_regex_match.group(1))
-            if card_offers_per_pick < 2 or card_offers_per_pick > 10:
-                error = f"detected a given amount of card_offers_per_pick of {card_offers_per_pick}, but the amount of card_offers_per_pick has to be between 2 and 10!"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return card_offers_per_pick
-    
-    async def _get_cards_to_choose_per_pick(self, message_content: str, message: discord.Message, card_offers_per_pick: int) -> int:
-        cards_to_choose_per_pick = self.cards_to_choose_per_pick_default
-        cards_to_choose_per_pick_regex = r".*cards-to-choose-per-pick=(\d+).*"
-        cards_to_choose_per_pick_regex_match = re.match(cards_to_choose_per_pick_regex, message_content)
-        if bool(cards_to_choose_per_pick_regex_match):
-            cards_to_choose_per_pick = int(cards_to_choose_per_pick_regex_match.group(1))
-            if cards_to_choose_per_pick < 1 or cards_to_choose_per_pick > 9:
-                error = f"detected a given amount of card_offers_per_pick of {cards_to_choose_per_pick}, but the amount of cards_to_choose_per_pick has to be between 1 and 9!"
-                await message.channel.send(error)
-                raise ValueError(error)
-            if cards_to_choose_per_pick >= card_offers_per_pick:
-                error = f"detected a given amount of card_offers_per_pick of {cards_to_choose_per_pick} and a given amount of card_offers_per_pick of {card_offers_per_pick}, but the amount of cards_to_choose_per_pick has to be smaller than the amount of card_offers_per_pick"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return cards_to_choose_per_pick
-    
-    async def _get_card_bucket_size(self, message_content: str, message: discord.Message, cards_to_choose_per_pick: int) -> int:
-        card_bucket_size = self.card_bucket_size_default
-        card_bucket_size_regex = r".*card-bucket-size=(\d+).*"
-        card_bucket_size_regex_match = re.match(card_bucket_size_regex, message_content)
-        if bool(card_bucket_size_regex_match):
-            card_bucket_size = int(card_bucket_size_regex_match.group(1))
-            if card_bucket_size < 1 or card_bucket_size > 5:
-                error = f"detected a given card_bucket_size of {card_bucket_size}, but the card_bucket_size has to be between 1 and 5!"
-                await message.channel.send(error)
-                raise ValueError(error)
-            if card_bucket_size > 1 and cards_to_choose_per_pick > 1:
-                error = f"Only one of card_bucket_size and cards_to_choose_per_pick can be greater than 1"
-                await message.channel.send(error)
-                raise ValueError(error)
-        return card_bucket_size
+            preset = self.legacy_cards_and_weights_default if options.legacy else self.cards_and_weights_default
+        # the presets are shared and never changed, the rarity changes are only laid over them
+        if not options.rarities_and_weight_factors:
+            return preset
+        return preset.with_factors(rarities_and_factors=options.rarities_and_weight_factors)
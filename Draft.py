@@ -1,10 +1,22 @@
 from CardPool import CardPool
-from typing import Dict, List, Literal
+from typing import Callable, DefaultDict, Dict, List, Literal, Mapping, Optional, Tuple, TypeVar
+from collections import defaultdict
+from concurrent.futures import Executor
+import asyncio
+import functools
 import discord
+import logging
+import sys
+import time
 from Deck import Deck
 import random
 import numpy as np
 import discord
+from CardWeights import card_weights_vector
+from DraftMessageUpdateScheduler import DraftMessageUpdateScheduler
+from DraftStore import DraftState
+from Metrics import metrics, COMMAND_STAGE_DURATION
+from CardData import DECK_RARITY_CODES, FACTION_CODES, NEUTRAL_FACTION_CODE
 from constants import DECKLINK_PREFIX, LEGACY_DECKLINK_PREFIX
 
 REACTIONS_NUMBERS = {
@@ -22,8 +34,16 @@ REACTIONS_NUMBERS = {
 
 NUMBERS_REACTIONS = { value: key for key, value in REACTIONS_NUMBERS.items() }
 
+logger = logging.getLogger(__name__)
+
+RollResult = TypeVar("RollResult")
+# current_choices, card_offers_per_pick, cards_to_choose_per_pick, card_bucket_size and user_task after a roll
+RolledChoices = Tuple[List[str] | List[List[str]], int, int, int, str]
+# draftable_card_ids, draftable_card_names, draftable_card_weights and draftable_card_indices_by_id
+DraftableCards = Tuple[np.ndarray, List[str], np.ndarray, Dict[int, int]]
+
 class Draft:
-    def __init__(self, draft_init_message_content: str, draft_message: discord.Message, discord_bot_user: discord.User, user: discord.User, card_pool: CardPool, amount_cards: int, factions_and_weights: Dict[Literal["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar"], int], cards_and_weights: Dict[int, float], faction_offers: int, card_offers_per_pick: int, cards_to_choose_per_pick: int, card_bucket_size: int) -> None:
+    def __init__(self, draft_init_message_content: str, draft_message: discord.Message, discord_bot_user: discord.User, user: discord.User, card_pool: CardPool, amount_cards: int, factions_and_weights: Dict[Literal["Lyonar", "Songhai", "Vetruvian", "Abyssian", "Magmar", "Vanar"], int], cards_and_weights: Mapping[int, float], faction_offers: int, card_offers_per_pick: int, cards_to_choose_per_pick: int, card_bucket_size: int, executor: Optional[Executor] = None, roll_timeout: Optional[float] = None, update_scheduler: Optional[DraftMessageUpdateScheduler] = None) -> None:
         self.draft_init_message_content = draft_init_message_content
         self.draft_message = draft_message
         self.discord_bot_user = discord_bot_user
@@ -40,15 +60,113 @@ class Draft:
         self.drafted_deck.max_cards = amount_cards
         self.current_choices: List[str] | List[List[str]] = []
         self.current_reactions: List[discord.Reaction] = []
-        self.status: Literal["Init", "Picking Faction", "Picking Cards", "Draft Completed", "!!! Draft abandoned !!!"] = "Init"
+        self.status: Literal["Init", "Picking Faction", "Picking Cards", "Draft Completed", "!!! Draft abandoned !!!", "!!! Draft expired !!!", "!!! Draft cancelled !!!"] = "Init"
         self.user_task: str = ""
         self.deck_embed: discord.Embed = None
         self.maximum_offers = max(faction_offers, card_offers_per_pick)
+        self.rng = np.random.default_rng()
+        # the offers are rolled in the executor (None is the default executor of the event loop)
+        self.executor = executor
+        self.roll_timeout = roll_timeout
+        # without an update scheduler, every update edits the draft message right away
+        self.update_scheduler = update_scheduler
+        # REST calls to discord by kind and the finished picks, to see the REST calls per pick
+        self.rest_calls: DefaultDict[str, int] = defaultdict(lambda: 0)
+        self.picks = 0
+        # monotonic time of the last action of the user, the bot expires drafts, which are idle for too long
+        self.last_activity = time.monotonic()
+        # held by the bot while it handles a reaction, so the reactions of the draft are handled one after another
+        self.reaction_lock = asyncio.Lock()
+        # draftable cards of the picked faction and Neutral - set by _prepare_card_weights, a weight is set to 0 at 3 copies
+        self.draftable_card_ids: np.ndarray = np.empty(0, dtype=np.int64)
+        self.draftable_card_names: List[str] = []
+        self.draftable_card_weights: np.ndarray = np.empty(0, dtype=np.float64)
+        self.draftable_card_indices_by_id: Dict[int, int] = {}
+        self.amount_of_draftable_cards = 0
+
+    def to_state(self) -> DraftState:
+        '''json serializable state of the draft, from which it can be restored with from_state'''
+        state: DraftState = {
+            "draft_message_id": self.draft_message.id,
+            "channel_id": self.draft_message.channel.id,
+            "user_id": self.user.id,
+            "legacy": self.card_pool.legacy,
+            "draft_init_message_content": self.draft_init_message_content,
+            "amount_cards": self.drafted_deck.max_cards,
+            "factions_and_weights": self.factions_and_weights,
+            "faction_offers": self.faction_offers,
+            "card_offers_per_pick": self.card_offers_per_pick,
+            "cards_to_choose_per_pick": self.cards_to_choose_per_pick,
+            "card_bucket_size": self.card_bucket_size,
+            "status": self.status,
+            "user_task": self.user_task,
+            "current_choices": self.current_choices,
+            "faction": self.drafted_deck.faction,
+            "cards_and_counts": list(self.drafted_deck.cards_and_counts.items()),
+            "picks": self.picks,
+        }
+        if self.status == "Picking Faction":
+            # the draftable cards are only known after the faction is picked
+            state["card_weights"] = card_weights_vector(card_pool=self.card_pool, cards_and_weights=self.cards_and_weights).tolist()
+            # the card ids are stored with the weights, because the collectible cards can change until the draft is restored
+            state["card_weight_card_ids"] = self.card_pool.collectible_card_columns["id"].tolist()
+        else:
+            state["draftable_card_ids"] = self.draftable_card_ids.tolist()
+            state["draftable_card_weights"] = self.draftable_card_weights.tolist()
+        return state
+
+    @classmethod
+    def from_state(cls, state: DraftState, draft_message: discord.Message, discord_bot_user: discord.User, user: discord.User, card_pool: CardPool, executor: Optional[Executor] = None, roll_timeout: Optional[float] = None, update_scheduler: Optional[DraftMessageUpdateScheduler] = None) -> "Draft":
+        if "card_weights" in state:
+            # states without the card ids are aligned with the collectible cards at the time they were saved
+            card_ids = state.get("card_weight_card_ids", card_pool.collectible_card_columns["id"].tolist())
+            if len(state["card_weights"]) != len(card_ids):
+                raise ValueError(f"The draft state has {len(state['card_weights'])} card weights for {len(card_ids)} cards")
+            # cards, that aren't collectible anymore, are ignored by the card weight vector
+            cards_and_weights = {card_id: float(weight) for card_id, weight in zip(card_ids, state["card_weights"])}
+        else:
+            cards_and_weights = {}
+        draft = cls(
+            draft_init_message_content=state["draft_init_message_content"], draft_message=draft_message, discord_bot_user=discord_bot_user, user=user, card_pool=card_pool,
+            amount_cards=state["amount_cards"], factions_and_weights=state["factions_and_weights"], cards_and_weights=cards_and_weights,
+            faction_offers=state["faction_offers"], card_offers_per_pick=state["card_offers_per_pick"], cards_to_choose_per_pick=state["cards_to_choose_per_pick"], card_bucket_size=state["card_bucket_size"],
+            executor=executor, roll_timeout=roll_timeout, update_scheduler=update_scheduler,
+        )
+        draft.status = state["status"]
+        draft.user_task = state["user_task"]
+        draft.current_choices = state["current_choices"]
+        draft.picks = state["picks"]
+        draft.drafted_deck.faction = state["faction"]
+        draft.drafted_deck.restore_cards_and_counts({card_id: count for card_id, count in state["cards_and_counts"]})
+        if "draftable_card_ids" in state:
+            draft.draftable_card_ids = np.array(state["draftable_card_ids"], dtype=np.int64)
+            draft.draftable_card_names = [card_pool.get_card_data_by_card_id(card_id).name for card_id in state["draftable_card_ids"]]
+            draft.draftable_card_weights = np.array(state["draftable_card_weights"], dtype=np.float64)
+            draft.draftable_card_indices_by_id = {card_id: index for index, card_id in enumerate(state["draftable_card_ids"])}
+            draft.amount_of_draftable_cards = int((draft.draftable_card_weights > 0).sum())
+        if draft.drafted_deck.amount_cards > 0:
+            draft.deck_embed = draft.drafted_deck.create_deck_embed()
+        return draft
 
     async def _update_deck_embed(self) -> None:
-        self.deck_embed = self.drafted_deck.create_deck_embed()
+        with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="render"):
+            self.deck_embed = self.drafted_deck.create_deck_embed()
+
+    def _count_rest_calls(self, kind: str, amount: int = 1) -> None:
+        self.rest_calls[kind] += amount
+        metrics.increment("draft_rest_calls_total", amount, kind=kind)
+
+    @property
+    def rest_calls_per_pick(self) -> float:
+        return sum(self.rest_calls.values()) / max(self.picks, 1)
 
     async def update_draft_message(self) -> None:
+        if self.update_scheduler is None:
+            await self._edit_draft_message()
+        else:
+            self.update_scheduler.schedule(message_id=self.draft_message.id, update=self._edit_draft_message)
+
+    async def _edit_draft_message(self) -> None:
         current_choices_message = ""
         for index, current_choice in enumerate(self.current_choices):
             current_choices_message += f"{NUMBERS_REACTIONS[index]} {current_choice}\n"
@@ -62,13 +180,41 @@ Cards drafted: {self.drafted_deck.amount_cards}/{self.drafted_deck.max_cards}
 
 {current_choices_message}
         """
-        await self.draft_message.edit(content=message, embed=self.deck_embed)
+        self._count_rest_calls(kind="edit")
+        with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="discord_send"):
+            await self.draft_message.edit(content=message, embed=self.deck_embed)
 
     async def abandon(self) -> None:
         self.status = "!!! Draft abandoned !!!"
         await self.update_draft_message()
-        await self._remove_user_reactions()
-        await self._remove_own_reactions()
+        await self._remove_all_reactions()
+
+    async def cancel(self) -> None:
+        self.status = "!!! Draft cancelled !!!"
+        self.user_task = "Rolling the offers took too long, please start a new draft"
+        self.current_choices = []
+        await self.update_draft_message()
+        await self._remove_all_reactions()
+
+    async def expire(self) -> None:
+        self.status = "!!! Draft expired !!!"
+        self.user_task = ""
+        self.current_choices = []
+        await self.update_draft_message()
+        await self._remove_all_reactions()
+
+    @property
+    def approximate_memory_bytes(self) -> int:
+        '''approximate memory of the draft state, without the shared card pool and discord objects'''
+        return (
+            self.draftable_card_ids.nbytes
+            + self.draftable_card_weights.nbytes
+            + sys.getsizeof(self.draftable_card_names)
+            + sys.getsizeof(self.draftable_card_indices_by_id)
+            + sys.getsizeof(self.drafted_deck.cards_and_counts)
+            + sys.getsizeof(self.current_choices)
+            + sys.getsizeof(self.current_reactions)
+        )
 
     async def start_draft(self) -> None:
         self.status = "Picking Faction"
@@ -77,15 +223,30 @@ Cards drafted: {self.drafted_deck.amount_cards}/{self.drafted_deck.max_cards}
         await self.update_draft_message()
 
     async def user_adds_reaction(self, reaction: discord.Reaction) -> bool: 
+        self.last_activity = time.monotonic()
         self.current_reactions.append(reaction)
         if self.status == "Picking Faction":
             if len(self.current_reactions) == 1:
+                self.picks += 1
                 await self._add_chosen_general()
+                with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="weight_prep"):
+                    draftable_cards = await self._run_in_executor(functools.partial(self._prepare_card_weights, faction=self.drafted_deck.faction))
+                draftable_card_ids, draftable_card_names, draftable_card_weights, draftable_card_indices_by_id = draftable_cards
+                with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="sample"):
+                    rolled_choices = await self._run_in_executor(self._card_choices_roll(draftable_card_names=draftable_card_names, draftable_card_weights=draftable_card_weights, amount_of_draftable_cards=len(draftable_card_ids)))
+                # the status changes together with the draftable cards and the offers after the rolls, so the draft is
+                # never seen picking cards with the general offers
                 self.status = "Picking Cards"
-                await self._prepare_card_weights()
-                await self._prepare_next_choices()
+                self.draftable_card_ids, self.draftable_card_names, self.draftable_card_weights, self.draftable_card_indices_by_id = draftable_cards
+                self.amount_of_draftable_cards = len(self.draftable_card_ids)
+                # from now on only the draftable arrays are used, so the weights of the whole pool are released
+                self.cards_and_weights = {}
+                self.current_choices, self.card_offers_per_pick, self.cards_to_choose_per_pick, self.card_bucket_size, self.user_task = rolled_choices
+                await self.update_draft_message()
+                await self._remove_user_reactions()
         elif self.status == "Picking Cards":
             if len(self.current_reactions) == self.cards_to_choose_per_pick:
+                self.picks += 1
                 await self._add_chosen_cards()
                 if self.drafted_deck.remaining_cards == 0:
                     self.status = "Draft Completed"
@@ -96,27 +257,54 @@ Cards drafted: {self.drafted_deck.amount_cards}/{self.drafted_deck.max_cards}
     
     async def _prepare_next_choices(self) -> None:
         await self._roll_choices()
-        await self._remove_user_reactions()
         await self.update_draft_message()
+        await self._remove_user_reactions()
 
     async def _roll_choices(self) -> None:
-        if self.status == "Picking Faction":
-            await self._roll_general_choices()
-        elif self.status == "Picking Cards":
-            await self._roll_card_choices()
+        # the rolls only get copies of the changing state and the result is set at once after the roll, so reactions,
+        # that are handled during the roll, see the offers, that the user sees
+        with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="sample"):
+            if self.status == "Picking Faction":
+                rolled_choices = await self._run_in_executor(self._roll_general_choices)
+            elif self.status == "Picking Cards":
+                rolled_choices = await self._run_in_executor(self._card_choices_roll(draftable_card_names=self.draftable_card_names, draftable_card_weights=self.draftable_card_weights, amount_of_draftable_cards=self.amount_of_draftable_cards))
+            else:
+                return
+        self.current_choices, self.card_offers_per_pick, self.cards_to_choose_per_pick, self.card_bucket_size, self.user_task = rolled_choices
+
+    def _card_choices_roll(self, draftable_card_names: List[str], draftable_card_weights: np.ndarray, amount_of_draftable_cards: int) -> Callable[[], RolledChoices]:
+        return functools.partial(
+            self._roll_card_choices,
+            draftable_card_names=draftable_card_names,
+            draftable_card_weights=draftable_card_weights.copy(),
+            remaining_cards=self.drafted_deck.remaining_cards,
+            amount_of_draftable_cards=amount_of_draftable_cards,
+            card_offers_per_pick=self.card_offers_per_pick,
+            cards_to_choose_per_pick=self.cards_to_choose_per_pick,
+            card_bucket_size=self.card_bucket_size,
+        )
 
-    async def _roll_general_choices(self) -> None:
+    async def _run_in_executor(self, roll: Callable[[], RollResult]) -> RollResult:
+        try:
+            return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(self.executor, roll), timeout=self.roll_timeout)
+        except asyncio.TimeoutError:
+            error = f"Rolling the offers of {self.user.name}'s draft took longer than {self.roll_timeout} seconds"
+            # without new offers the draft can't go on - it is cancelled and the bot removes it on the TimeoutError
+            try:
+                await self.cancel()
+            except discord.HTTPException:
+                pass
+            raise TimeoutError(error)
+
+    def _roll_general_choices(self) -> RolledChoices:
         # Weights for numpy choice have to be equal to one
         total_weight = sum(self.factions_and_weights.values())
-        for key, value in self.factions_and_weights.items():
-            self.factions_and_weights[key] = value / total_weight
-        factions_to_offer = np.random.choice(a=list(self.factions_and_weights.keys()), size=self.faction_offers, replace=False, p=list(self.factions_and_weights.values()))
+        factions_to_offer = np.random.choice(a=list(self.factions_and_weights.keys()), size=self.faction_offers, replace=False, p=[weight / total_weight for weight in self.factions_and_weights.values()])
         generals_to_offer = []
         for faction_to_offer in factions_to_offer:
             rolled_general = random.choice(self.card_pool.generals_by_faction[faction_to_offer])
             generals_to_offer.append(rolled_general.name)
-        self.current_choices = generals_to_offer
-        self.user_task = "Pick your General by reacting"
+        return generals_to_offer, self.card_offers_per_pick, self.cards_to_choose_per_pick, self.card_bucket_size, "Pick your General by reacting"
 
     async def _add_chosen_general(self) -> None:
         reaction = self.current_reactions[0]
@@ -126,52 +314,54 @@ Cards drafted: {self.drafted_deck.amount_cards}/{self.drafted_deck.max_cards}
         self.drafted_deck.add_card_and_count(picked_general_card.id, 1)
         await self._update_deck_embed()
 
-    async def _prepare_card_weights(self) -> None:
-        for card_id in self.cards_and_weights.keys():
-            card = self.card_pool.get_card_data_by_card_id(card_id=card_id)
-            if card.faction != self.drafted_deck.faction and card.faction != "Neutral":
-                self.cards_and_weights[card_id] = 0
+    def _prepare_card_weights(self, faction: str) -> DraftableCards:
+        columns = self.card_pool.collectible_card_columns
+        draftable = ((columns["faction"] == FACTION_CODES[faction]) | (columns["faction"] == NEUTRAL_FACTION_CODE)) & np.isin(columns["rarity"], list(DECK_RARITY_CODES))
+        card_indices = np.flatnonzero(draftable)
+        card_weights = card_weights_vector(card_pool=self.card_pool, cards_and_weights=self.cards_and_weights)[card_indices]
+        card_indices = card_indices[card_weights > 0]
+        draftable_card_ids = columns["id"][card_indices]
+        draftable_card_names = [self.card_pool.collectible_cards[card_index].name for card_index in card_indices.tolist()]
+        draftable_card_indices_by_id = {card_id: index for index, card_id in enumerate(draftable_card_ids.tolist())}
+        return draftable_card_ids, draftable_card_names, card_weights[card_weights > 0], draftable_card_indices_by_id
 
-    async def _roll_card_choices(self) -> None:
-        self.current_choices = []
-        amount_of_draftable_cards = len(list(self.cards_and_weights.keys()))
+    def _roll_draftable_card_names(self, draftable_card_names: List[str], draftable_card_weights: np.ndarray, size: int) -> List[str]:
+        # weighted sampling without replacement in one go: the smallest exponential keys divided by the weights win,
+        # cards with weight 0 get an infinite key and are never among the first size cards
+        if size == 0:
+            return []
+        with np.errstate(divide="ignore"):
+            keys = self.rng.exponential(size=len(draftable_card_weights)) / draftable_card_weights
+        rolled_indices = np.argpartition(keys, size - 1)[:size]
+        rolled_indices = rolled_indices[np.argsort(keys[rolled_indices])]
+        return [draftable_card_names[index] for index in rolled_indices.tolist()]
+
+    def _roll_card_choices(self, draftable_card_names: List[str], draftable_card_weights: np.ndarray, remaining_cards: int, amount_of_draftable_cards: int, card_offers_per_pick: int, cards_to_choose_per_pick: int, card_bucket_size: int) -> RolledChoices:
+        current_choices = []
         # for single cards
-        if self.drafted_deck.remaining_cards < self.cards_to_choose_per_pick:
-            self.cards_to_choose_per_pick = self.drafted_deck.remaining_cards
-        if amount_of_draftable_cards < self.card_offers_per_pick:
-            self.card_offers_per_pick = amount_of_draftable_cards
+        if remaining_cards < cards_to_choose_per_pick:
+            cards_to_choose_per_pick = remaining_cards
+        if amount_of_draftable_cards < card_offers_per_pick:
+            card_offers_per_pick = amount_of_draftable_cards
         # for card buckets
-        if self.drafted_deck.remaining_cards < self.card_bucket_size:
-            self.card_bucket_size = self.drafted_deck.remaining_cards
-        if amount_of_draftable_cards < self.card_bucket_size:
-            self.card_bucket_size = amount_of_draftable_cards
-            self.card_offers_per_pick = 1
-        # Weights for numpy choice have to be equal to one
-        total_weight = sum(self.cards_and_weights.values())
-        for key, value in self.cards_and_weights.items():
-            self.cards_and_weights[key] = value / total_weight
+        if remaining_cards < card_bucket_size:
+            card_bucket_size = remaining_cards
+        if amount_of_draftable_cards < card_bucket_size:
+            card_bucket_size = amount_of_draftable_cards
+            card_offers_per_pick = 1
         # for single cards
-        if self.card_bucket_size == 1:
-            card_ids = np.random.choice(a=list(self.cards_and_weights.keys()), size=self.card_offers_per_pick, replace=False, p=list(self.cards_and_weights.values()))
-            # Convert IDs to names
-            for card_id in card_ids:
-                card_name = self.card_pool.get_card_data_by_card_id(card_id).name
-                self.current_choices.append(card_name)
+        if card_bucket_size == 1:
+            current_choices = self._roll_draftable_card_names(draftable_card_names=draftable_card_names, draftable_card_weights=draftable_card_weights, size=card_offers_per_pick)
         # for card buckets
         else:
-            for card_offer_per_pick in range(self.card_offers_per_pick):
+            for card_offer_per_pick in range(card_offers_per_pick):
                 for _ in range(10):
-                    card_ids = np.random.choice(a=list(self.cards_and_weights.keys()), size=self.card_bucket_size, replace=False, p=list(self.cards_and_weights.values()))
-                    # Convert IDs to names
-                    card_names = []
-                    for card_id in card_ids:
-                        card_name = self.card_pool.get_card_data_by_card_id(card_id).name
-                        card_names.append(card_name)
+                    card_names = self._roll_draftable_card_names(draftable_card_names=draftable_card_names, draftable_card_weights=draftable_card_weights, size=card_bucket_size)
                     card_names.sort()
-                    if card_names not in self.current_choices:
-                        self.current_choices.append(card_names)
+                    if card_names not in current_choices:
+                        current_choices.append(card_names)
                         break
-        self.user_task = f"Pick {self.cards_to_choose_per_pick} Card Bucket(s) by reacting"
+        return current_choices, card_offers_per_pick, cards_to_choose_per_pick, card_bucket_size, f"Pick {cards_to_choose_per_pick} Card Bucket(s) by reacting"
 
     async def _add_chosen_cards(self) -> None:
         for reaction in self.current_reactions:
@@ -189,24 +379,46 @@ Cards drafted: {self.drafted_deck.amount_cards}/{self.drafted_deck.max_cards}
         card = self.card_pool.get_collectible_card_by_card_name_from_faction(card_name=card_name, faction=self.drafted_deck.faction)
         self.drafted_deck.add_card_and_count(card.id, 1)
         if self.drafted_deck.cards_and_counts[card.id] == 3:
-            del self.cards_and_weights[card.id]
+            self.draftable_card_weights[self.draftable_card_indices_by_id[card.id]] = 0
+            self.amount_of_draftable_cards -= 1
 
     async def _finish_draft(self) -> None:
         self.user_task = ""
         self.current_choices = []
         await self._update_deck_embed()
         await self.update_draft_message()
-        await self._remove_user_reactions()
-        await self._remove_own_reactions()
+        await self._remove_all_reactions()
 
     async def _add_reactions(self) -> None:
-        for number in range(self.maximum_offers):
-            await self.draft_message.add_reaction(NUMBERS_REACTIONS[number])
+        # one after another, so the reactions keep their order
+        with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="discord_send"):
+            for number in range(self.maximum_offers):
+                self._count_rest_calls(kind="add_reaction")
+                await self.draft_message.add_reaction(NUMBERS_REACTIONS[number])
+
+    async def _remove_all_reactions(self) -> None:
+        # one request for all reactions - removing the reactions one by one is the fallback, if the bot isn't allowed to
+        try:
+            self._count_rest_calls(kind="clear_reactions")
+            with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="discord_send"):
+                await self.draft_message.clear_reactions()
+        except discord.Forbidden:
+            await self._remove_user_reactions()
+            await self._remove_own_reactions()
 
     async def _remove_own_reactions(self) -> None:
-        for number in reversed(range(self.maximum_offers)):
-            await self.draft_message.remove_reaction(NUMBERS_REACTIONS[number], self.discord_bot_user)
+        with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="discord_send"):
+            for number in reversed(range(self.maximum_offers)):
+                self._count_rest_calls(kind="remove_reaction")
+                await self.draft_message.remove_reaction(NUMBERS_REACTIONS[number], self.discord_bot_user)
 
     async def _remove_user_reactions(self) -> None:
-        for reaction in reversed(self.current_reactions):
-            await reaction.remove(user=self.user)
\ No newline at end of file
+        # the bot reactions stay, so only the picks of the user are removed
+        reactions = list(reversed(self.current_reactions))
+        self._count_rest_calls(kind="remove_reaction", amount=len(reactions))
+        with metrics.time(COMMAND_STAGE_DURATION, command="draft", stage="discord_send"):
+            results = await asyncio.gather(*[reaction.remove(self.user) for reaction in reactions], return_exceptions=True)
+        # a failed removal only leaves a reaction on the message, the other removals and the draft go on
+        for reaction, result in zip(reactions, results):
+            if isinstance(result, Exception):
+                logger.warning("Removing the reaction %s of %s failed: %s", reaction.emoji, self.user.name, result)
\ No newline at end of file
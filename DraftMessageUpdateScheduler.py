@@ -0,0 +1,48 @@
+from typing import Awaitable, Callable, Dict
+import asyncio
+import logging
+import discord
+
+DRAFT_MESSAGE_UPDATE_DEBOUNCE_SECONDS = 0.3
+MAX_CONCURRENT_DRAFT_MESSAGE_UPDATES = 5
+
+logger = logging.getLogger(__name__)
+
+
+class DraftMessageUpdateScheduler:
+    '''Coalesces the message edits of the drafts
+
+    An update of a draft message without a pending edit is edited right away. All updates, that are requested while
+    that edit is in flight or within the debounce time after it, are coalesced into one edit, which shows the state
+    of the draft at the time of the edit. The edits of different drafts run concurrently, but at most
+    max_concurrent_updates at a time and in the order they became due, so a busy draft can't starve the others.
+    '''
+    def __init__(self, debounce_seconds: float = DRAFT_MESSAGE_UPDATE_DEBOUNCE_SECONDS, max_concurrent_updates: int = MAX_CONCURRENT_DRAFT_MESSAGE_UPDATES) -> None:
+        self.debounce_seconds = debounce_seconds
+        self.semaphore = asyncio.Semaphore(max_concurrent_updates)
+        # message id -> edit, that is due next
+        self.pending_updates: Dict[int, Callable[[], Awaitable[None]]] = {}
+        self.update_tasks: Dict[int, asyncio.Task] = {}
+        self.requested_updates = 0
+        self.performed_updates = 0
+
+    def schedule(self, message_id: int, update: Callable[[], Awaitable[None]]) -> None:
+        self.requested_updates += 1
+        self.pending_updates[message_id] = update
+        if message_id not in self.update_tasks:
+            self.update_tasks[message_id] = asyncio.get_running_loop().create_task(self._run_updates(message_id))
+
+    async def _run_updates(self, message_id: int) -> None:
+        try:
+            while message_id in self.pending_updates:
+                update = self.pending_updates.pop(message_id)
+                async with self.semaphore:
+                    try:
+                        await update()
+                    except discord.HTTPException as e:
+                        logger.warning("Update of the draft message %d failed: %s", message_id, e)
+                self.performed_updates += 1
+                # the updates requested until the debounce time after this edit is over go into the next edit
+                await asyncio.sleep(self.debounce_seconds)
+        finally:
+            del self.update_tasks[message_id]
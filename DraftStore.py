@@ -0,0 +1,31 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+# state of a draft as returned by Draft.to_state - only json serializable values
+DraftState = Dict[str, Any]
+
+
+class DraftStoreError(Exception):
+    '''the saved drafts can't be read from the draft store'''
+
+
+class DraftStore(ABC):
+    '''Interface of a persistence layer for the states of the ongoing drafts
+
+    save and delete are called on every pick, so they must not block - an implementation should only queue the write.
+    '''
+    @abstractmethod
+    def save(self, draft_state: DraftState) -> None:
+        '''saves the state of a draft, a saved state of the same draft message is replaced'''
+
+    @abstractmethod
+    def delete(self, draft_message_id: int) -> None:
+        '''deletes the saved state of a draft, if there is one'''
+
+    @abstractmethod
+    async def load_all(self) -> List[DraftState]:
+        '''states of all saved drafts, including the queued writes - raises a DraftStoreError, if they can't be read'''
+
+    @abstractmethod
+    def close(self) -> None:
+        '''finishes all queued writes'''
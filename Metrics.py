@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+import bisect
+import threading
+import time
+
+METRICS_PREFIX = "deckroll_"
+# upper bounds of the latency histogram buckets - from sub-millisecond parsing up to rolls close to the roll timeout
+LATENCY_BUCKETS_SECONDS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# histogram of the latencies of the commands by command and stage (parse, weight_prep, sample, render, discord_send, total)
+COMMAND_STAGE_DURATION = "command_stage_duration_seconds"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    '''Thread-safe counters and latency histograms plus gauges, that are collected on every scrape
+
+    The metrics are rendered in the Prometheus text format, every name gets the METRICS_PREFIX. Recording a value
+    only takes a lock and a dict update, so the metrics can be recorded on the event loop and in the roll threads.
+    '''
+    def __init__(self, latency_buckets: Tuple[float, ...] = LATENCY_BUCKETS_SECONDS) -> None:
+        self.latency_buckets = latency_buckets
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        # name -> labels -> [count per bucket (the last one is +Inf), sum of the observed values]
+        self.histograms: Dict[str, Dict[Labels, Tuple[List[int], List[float]]]] = {}
+        # functions, that return the current gauge values on a scrape - names ending with _total are rendered as counters
+        self.collectors: List[Callable[[], Dict[str, float]]] = []
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            values = self.counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            values = self.histograms.setdefault(name, {})
+            if key not in values:
+                values[key] = ([0] * (len(self.latency_buckets) + 1), [0.0])
+            bucket_counts, total = values[key]
+            bucket_counts[bisect.bisect_left(self.latency_buckets, seconds)] += 1
+            total[0] += seconds
+
+    @contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        '''observes the duration of the with block (also if it raises)'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        '''all metrics in the Prometheus text format (version 0.0.4)'''
+        lines: List[str] = []
+        with self._lock:
+            counters = {name: dict(values) for name, values in self.counters.items()}
+            histograms = {name: {key: (list(bucket_counts), total[0]) for key, (bucket_counts, total) in values.items()} for name, values in self.histograms.items()}
+        for name, values in sorted(counters.items()):
+            lines.append(f"# TYPE {METRICS_PREFIX}{name} counter")
+            for key, value in sorted(values.items()):
+                lines.append(f"{METRICS_PREFIX}{name}{_render_labels(key)} {value}")
+        for name, values in sorted(histograms.items()):
+            lines.append(f"# TYPE {METRICS_PREFIX}{name} histogram")
+            for key, (bucket_counts, total) in sorted(values.items()):
+                cumulative_count = 0
+                for upper_bound, bucket_count in zip([*self.latency_buckets, "+Inf"], bucket_counts):
+                    cumulative_count += bucket_count
+                    lines.append(f"{METRICS_PREFIX}{name}_bucket{_render_labels(key + (('le', str(upper_bound)),))} {cumulative_count}")
+                lines.append(f"{METRICS_PREFIX}{name}_sum{_render_labels(key)} {total}")
+                lines.append(f"{METRICS_PREFIX}{name}_count{_render_labels(key)} {cumulative_count}")
+        for collector in self.collectors:
+            for name, value in collector().items():
+                lines.append(f"# TYPE {METRICS_PREFIX}{name} {'counter' if name.endswith('_total') else 'gauge'}")
+                lines.append(f"{METRICS_PREFIX}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels_key(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _render_labels(key: Labels) -> str:
+    if not key:
+        return ""
+    rendered_labels = ",".join(f'{label}="{_escape_label_value(value)}"' for label, value in key)
+    return "{" + rendered_labels + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# shared by the bot, the drafts and the samplers - like a logger, every module records into the same metrics
+metrics = Metrics()
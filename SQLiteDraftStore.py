@@ -0,0 +1,67 @@
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from DraftStore import DraftStore, DraftStoreError, DraftState
+
+DRAFT_STORE_PATH = "drafts.sqlite3"
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteDraftStore(DraftStore):
+    '''DraftStore in a SQLite database with one row per draft message
+
+    The writes are done in order by a single background thread, so a save on a pick costs only the json dump of
+    the state. The database runs in WAL mode with synchronous=NORMAL, which keeps every committed pick after a crash
+    of the bot (only a power loss can cost the last picks).
+    '''
+    def __init__(self, path: str = DRAFT_STORE_PATH) -> None:
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # the connection is only used by the writer thread, which also does the reads of load_all
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS drafts (draft_message_id INTEGER PRIMARY KEY, state TEXT NOT NULL)")
+        self.connection.commit()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="draft store")
+
+    def save(self, draft_state: DraftState) -> None:
+        self.writer.submit(self._write, "INSERT OR REPLACE INTO drafts (draft_message_id, state) VALUES (?, ?)", (draft_state["draft_message_id"], json.dumps(draft_state)))
+
+    def delete(self, draft_message_id: int) -> None:
+        self.writer.submit(self._write, "DELETE FROM drafts WHERE draft_message_id = ?", (draft_message_id,))
+
+    async def load_all(self) -> List[DraftState]:
+        # the read waits for the queued writes in the writer thread, not in the event loop
+        return await asyncio.wrap_future(self.writer.submit(self._read_all))
+
+    def close(self) -> None:
+        self.writer.shutdown(wait=True)
+        self.connection.close()
+
+    def _write(self, statement: str, parameters: tuple) -> None:
+        try:
+            with self.connection:
+                self.connection.execute(statement, parameters)
+        except sqlite3.Error:
+            logger.exception("Writing to the draft store %s failed", self.path)
+
+    def _read_all(self) -> List[DraftState]:
+        try:
+            rows = self.connection.execute("SELECT draft_message_id, state FROM drafts").fetchall()
+        except sqlite3.Error as e:
+            raise DraftStoreError(f"Reading the draft store {self.path} failed: {e}") from e
+        draft_states = []
+        for draft_message_id, state in rows:
+            # a state, that isn't valid json, can never be restored
+            try:
+                draft_states.append(json.loads(state))
+            except ValueError:
+                logger.exception("The state of the draft %s in the draft store %s is no valid json, it is deleted", draft_message_id, self.path)
+                self._write("DELETE FROM drafts WHERE draft_message_id = ?", (draft_message_id,))
+        return draft_states
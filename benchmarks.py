@@ -0,0 +1,286 @@
+"""Offline benchmarks of the rolling, drafting, parsing and startup hot paths
+
+Only the bundled (or locally cached) card jsons are used and every roll is seeded, so two runs on the same machine
+are comparable. The results are printed as json and can be written to a file with --output to compare them over time.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import base64
+import collections
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from CardData import MAIN_FACTIONS
+from CardPool import CardPool
+from CardWeights import CardWeights
+from CommandOptions import CommandOptions
+from DeckCodec import DeckCodec
+from Deckroll import Deckroll
+from DeckrollSampler import DeckrollSampler
+from Draft import Draft
+import numpy as np
+
+BENCHMARK_SEED = 0
+BENCHMARK_DECKROLL_COMMAND = "!deckroll legacy cards=60 half-faction-half-neutral magmar=0 vanar=10 epic=10 legendary=0 count-chances=33/33/34 min-1-and-2-drops=8 max-1-and-2-drops=12"
+BENCHMARK_COMMANDS: Dict[str, str] = {
+    "deckroll": "!deckroll",
+    "deckroll_many_options": BENCHMARK_DECKROLL_COMMAND,
+    "draft": "!draft legacy cards=60 only-faction lyonar=5 rare=2 faction-offers=4 card-offers-per-pick=5 card-bucket-size=2",
+}
+# a fresh interpreter, that loads both card pools like main.py - prints its startup time and peak memory as json
+COLD_START_SCRIPT = """
+import time
+start = time.perf_counter()
+import contextlib, io, json, resource
+with contextlib.redirect_stdout(io.StringIO()):
+    from CardPool import CardPool
+    CardPool(legacy=False, revalidation="never")
+    CardPool(legacy=True, revalidation="never")
+print(json.dumps({"seconds": time.perf_counter() - start, "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def measure_card_pool_memory(legacy: bool) -> Dict[str, float]:
+    '''memory, that a card pool retains after its init (measured with tracemalloc)'''
+    with contextlib.redirect_stdout(io.StringIO()):
+        # the first init writes the snapshot, the second one is measured like a normal start
+        CardPool(legacy=legacy, revalidation="never")
+        gc.collect()
+        tracemalloc.start()
+        card_pool = CardPool(legacy=legacy, revalidation="never")
+        gc.collect()
+        retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "retained_bytes": retained_bytes,
+        "peak_bytes": peak_bytes,
+        "bytes_per_card": retained_bytes / len(card_pool.all_cards),
+    }
+
+
+def measure_command_option_parsing(repeats: int = 10000) -> Dict[str, float]:
+    '''bot-side parsing time per command of BENCHMARK_COMMANDS'''
+    defaults = CommandOptions(
+        factions_and_weights={faction: 1 for faction in MAIN_FACTIONS},
+        count_chances={1: 20, 2: 30, 3: 50},
+        count_chances_two_remaining_deck_slots={1: 33, 2: 67},
+    )
+    results = {}
+    for name, command in BENCHMARK_COMMANDS.items():
+        seconds = min(timeit.repeat(lambda: CommandOptions.parse(message_content=command, defaults=defaults), number=repeats, repeat=5))
+        results[f"{name}_microseconds_per_command"] = seconds / repeats * 1e6
+    return results
+
+
+def measure_deckrolls(card_pool: CardPool, amount_cards: int, constrained: bool, amount_decks: int = 2000) -> Dict[str, float]:
+    '''decks per second of Deckroll.roll_deck (like !deckroll) and Deckroll.roll_decks (like the spreadsheet)
+
+    The constrained rolls have rarity factors and limit the 1 and 2 drops to 20 - 30 % of the deck.
+    '''
+    cards_and_weights = CardWeights(card_pool=card_pool, preset=np.ones(len(card_pool.collectible_cards)))
+    if constrained:
+        cards_and_weights = cards_and_weights.with_factors(rarities_and_factors={"Epic": 10, "Legendary": 0})
+    deckroll = Deckroll(
+        card_pool=card_pool,
+        amount_cards=amount_cards,
+        factions_and_weights={faction: 1 for faction in MAIN_FACTIONS},
+        cards_and_weights=cards_and_weights,
+        count_chances={1: 20, 2: 30, 3: 50},
+        count_chances_two_remaining_deck_slots={1: 33, 2: 67},
+        **({"min_1_and_2_drops": amount_cards // 5, "max_1_and_2_drops": amount_cards * 3 // 10} if constrained else {}),
+    )
+    deckroll.rng = np.random.default_rng(BENCHMARK_SEED)
+    sampler_preparation_seconds = timeit.timeit(lambda: deckroll.sampler, number=1)
+    roll_deck_seconds = timeit.timeit(deckroll.roll_deck, number=amount_decks)
+    roll_decks_seconds = timeit.timeit(lambda: collections.deque(deckroll.roll_decks(amount_decks, seed=BENCHMARK_SEED), maxlen=0), number=1)
+    return {
+        "sampler_preparation_seconds": sampler_preparation_seconds,
+        "roll_deck_decks_per_second": amount_decks / roll_deck_seconds,
+        "roll_decks_decks_per_second": amount_decks / roll_decks_seconds,
+    }
+
+
+def measure_draft_picks(card_pool: CardPool, amount_cards: int, card_bucket_size: int = 1) -> Dict[str, float]:
+    '''latency of the bot-side work of a draft pick: rolling the offers, adding the picked cards and the deck embed
+
+    The discord calls of a pick (message edit, reactions) aren't part of it.
+    '''
+    draft = Draft(
+        draft_init_message_content="!draft",
+        draft_message=None,
+        discord_bot_user=None,
+        user=None,
+        card_pool=card_pool,
+        amount_cards=amount_cards,
+        factions_and_weights={faction: 1 for faction in MAIN_FACTIONS},
+        cards_and_weights=CardWeights(card_pool=card_pool, preset=np.ones(len(card_pool.collectible_cards))),
+        faction_offers=3,
+        card_offers_per_pick=3,
+        cards_to_choose_per_pick=1,
+        card_bucket_size=card_bucket_size,
+    )
+    draft.rng = np.random.default_rng(BENCHMARK_SEED)
+    general = card_pool.generals_by_faction[MAIN_FACTIONS[0]][0]
+    draft.drafted_deck.faction = general.faction
+    draft.drafted_deck.add_card_and_count(general.id, 1)
+    draft.draftable_card_ids, draft.draftable_card_names, draft.draftable_card_weights, draft.draftable_card_indices_by_id = draft._prepare_card_weights(faction=general.faction)
+    draft.amount_of_draftable_cards = len(draft.draftable_card_ids)
+
+    async def draft_all_cards() -> List[float]:
+        pick_seconds = []
+        while draft.drafted_deck.remaining_cards > 0:
+            start = time.perf_counter()
+            draft.current_choices, draft.card_offers_per_pick, draft.cards_to_choose_per_pick, draft.card_bucket_size, draft.user_task = draft._roll_card_choices(
+                draftable_card_names=draft.draftable_card_names,
+                draftable_card_weights=draft.draftable_card_weights.copy(),
+                remaining_cards=draft.drafted_deck.remaining_cards,
+                amount_of_draftable_cards=draft.amount_of_draftable_cards,
+                card_offers_per_pick=draft.card_offers_per_pick,
+                cards_to_choose_per_pick=draft.cards_to_choose_per_pick,
+                card_bucket_size=draft.card_bucket_size,
+            )
+            picked_choice = draft.current_choices[0]
+            for card_name in picked_choice if isinstance(picked_choice, list) else [picked_choice]:
+                await draft._add_chosen_card(card_name=card_name)
+            await draft._update_deck_embed()
+            pick_seconds.append(time.perf_counter() - start)
+        return pick_seconds
+
+    pick_milliseconds = np.array(asyncio.run(draft_all_cards())) * 1000
+    return {
+        "picks": len(pick_milliseconds),
+        "mean_milliseconds_per_pick": float(pick_milliseconds.mean()),
+        "p95_milliseconds_per_pick": float(np.percentile(pick_milliseconds, 95)),
+        "max_milliseconds_per_pick": float(pick_milliseconds.max()),
+    }
+
+
+def measure_cold_start(repeats: int = 3) -> Dict[str, float]:
+    '''startup time and peak memory of a fresh interpreter, that loads both card pools (from their snapshots)'''
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    # ru_maxrss is given in kilobytes on linux and in bytes on macOS
+    max_rss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "seconds": min(run["seconds"] for run in runs),
+        "peak_rss_bytes": max(run["max_rss"] for run in runs) * max_rss_unit,
+    }
+
+
+def _former_deckcode(cards_and_counts: Dict[int, int]) -> str:
+    '''Deck.deckcode before the DeckCodec'''
+    concatenated_string_with_counts_and_cards = ""
+    for card_id, count in cards_and_counts.items():
+        if 1 <= count <= 3:
+            concatenated_string_with_counts_and_cards += f"{count}:{card_id},"
+    if concatenated_string_with_counts_and_cards.endswith(","):
+        concatenated_string_with_counts_and_cards = concatenated_string_with_counts_and_cards[:-1]
+    return base64.standard_b64encode(concatenated_string_with_counts_and_cards.encode()).decode()
+
+
+def _former_cards_and_counts_from_deckcode(deckcode: str) -> Dict[str, str]:
+    '''Deck.create_cards_and_counts_from_deckcode before the DeckCodec - without validation and with string ids'''
+    if deckcode.startswith("[") and "]" in deckcode:
+        deckcode = deckcode[deckcode.index("]") + 1 :]
+    cards_and_counts = {}
+    for count_and_card in base64.b64decode(deckcode).decode().split(","):
+        count, card_id = count_and_card.split(":")
+        cards_and_counts[card_id] = count
+    return cards_and_counts
+
+
+def measure_deckcode_codec(amount_decks: int = 10000) -> Dict[str, float]:
+    '''encoding and decoding of rolled decks with the DeckCodec compared to the former implementation'''
+    with contextlib.redirect_stdout(io.StringIO()):
+        card_pool = CardPool(legacy=False, revalidation="never")
+    sampler = DeckrollSampler(
+        card_pool=card_pool,
+        amount_cards=40,
+        factions_and_weights={faction: 1 for faction in MAIN_FACTIONS},
+        cards_and_weights=card_pool.cards_and_weights_from_vector(np.ones(len(card_pool.collectible_cards))),
+        count_chances={1: 20, 2: 30, 3: 50},
+        count_chances_two_remaining_deck_slots={1: 33, 2: 67},
+    )
+    rng = np.random.default_rng(0)
+    decks = []
+    for _ in range(amount_decks):
+        _, general_id, card_ids, counts = sampler.roll_deck(rng)
+        decks.append({general_id: 1, **dict(zip(card_ids.tolist(), counts.tolist()))})
+    deckcodes = [DeckCodec.encode(deck) for deck in decks]
+    codec = DeckCodec(card_pool=card_pool)
+    results = {
+        "former_encode_seconds": min(timeit.repeat(lambda: [_former_deckcode(deck) for deck in decks], number=1, repeat=3)),
+        "codec_encode_seconds": min(timeit.repeat(lambda: [DeckCodec.encode(deck) for deck in decks], number=1, repeat=3)),
+        "former_decode_seconds": min(timeit.repeat(lambda: [_former_cards_and_counts_from_deckcode(deckcode) for deckcode in deckcodes], number=1, repeat=3)),
+        "codec_decode_many_seconds": min(timeit.repeat(lambda: codec.decode_many(deckcodes), number=1, repeat=3)),
+        "codec_decode_many_without_validation_seconds": min(timeit.repeat(lambda: DeckCodec().decode_many(deckcodes), number=1, repeat=3)),
+    }
+    results["amount_decks"] = amount_decks
+    # the validated bulk decode must stay at least as fast as the former unvalidated per-code decode
+    results["codec_decode_many_speedup"] = results["former_decode_seconds"] / results["codec_decode_many_seconds"]
+    if results["codec_decode_many_speedup"] < 1:
+        print(f"DeckCodec.decode_many is {1 / results['codec_decode_many_speedup']:.2f}x slower than the former decode", file=sys.stderr)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(quick: bool = False) -> Dict[str, Any]:
+    '''all benchmarks with the environment they ran in - quick runs roll fewer decks, so they are noisier'''
+    amount_decks = 200 if quick else 2000
+    with contextlib.redirect_stdout(io.StringIO()):
+        card_pools = {"card_pool": CardPool(legacy=False, revalidation="never"), "legacy_card_pool": CardPool(legacy=True, revalidation="never")}
+    results: Dict[str, Any] = {
+        "environment": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "cards": {name: len(card_pool.all_cards) for name, card_pool in card_pools.items()},
+            "seed": BENCHMARK_SEED,
+            "quick": quick,
+        },
+        "cold_start": measure_cold_start(repeats=1 if quick else 3),
+        "card_pool_memory": measure_card_pool_memory(legacy=False),
+        "legacy_card_pool_memory": measure_card_pool_memory(legacy=True),
+        "command_option_parsing": measure_command_option_parsing(repeats=1000 if quick else 10000),
+    }
+    for name, card_pool in card_pools.items():
+        for amount_cards in (40, 100):
+            results[f"{name}_deckroll_{amount_cards}_cards"] = measure_deckrolls(card_pool=card_pool, amount_cards=amount_cards, constrained=False, amount_decks=amount_decks)
+            results[f"{name}_constrained_deckroll_{amount_cards}_cards"] = measure_deckrolls(card_pool=card_pool, amount_cards=amount_cards, constrained=True, amount_decks=amount_decks)
+            results[f"{name}_draft_{amount_cards}_cards"] = measure_draft_picks(card_pool=card_pool, amount_cards=amount_cards)
+        results[f"{name}_bucket_draft_40_cards"] = measure_draft_picks(card_pool=card_pool, amount_cards=40, card_bucket_size=3)
+    results["deckcode_codec"] = measure_deckcode_codec(amount_decks=1000 if quick else 10000)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="json file, the results are written to (additionally to stdout)")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions, e.g. for a quick check")
+    arguments = parser.parse_args()
+    results = run_benchmarks(quick=arguments.quick)
+    print(json.dumps(results, indent=4))
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            json.dump(results, output_file, indent=4)
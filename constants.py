@@ -1,2 +1,4 @@
 DECKLINK_PREFIX: str = "https://decklyst.vercel.app/decks/"
-LEGACY_DECKLINK_PREFIX: str = "https://dl.bagoum.com/deckbuilder#"
\ No newline at end of file
+LEGACY_DECKLINK_PREFIX: str = "https://dl.bagoum.com/deckbuilder#"
+DECKROLL_MODIFICATION_NOT_GIVEN: int = -1
+DECKROLL_ATTEMPTS: int = 100
@@ -1,14 +1,26 @@
 from CardPool import CardPool
 from Deckroll import Deckroll,  DECKROLL_MODIFICATION_NOT_GIVEN
 from copy import deepcopy
-from typing import Dict
-from CardData import ALL_FACTIONS, MAIN_FACTIONS
+from typing import Dict, Optional
+from CardData import ALL_FACTIONS, MAIN_FACTIONS, NEUTRAL_FACTION_CODE
+import numpy as np
+from CardWeights import CardWeights
 from DiscordBot import DiscordBot
+from SQLiteDraftStore import SQLiteDraftStore
 
 # MAIN OPTIONS
 CREATE_DECKROLL_EXCEL: bool = False
 AMOUNT_DECKS: int = 100
+# worker processes for the excel deckroll (None uses all cpu cores) and seed for reproducible excel files
+DECKROLL_EXCEL_WORKERS: Optional[int] = 1
+DECKROLL_EXCEL_SEED: Optional[int] = None
 START_DISCORD_BOT: bool = True
+# prepared deckroll samplers, that the discord bot keeps for recently used options
+DISCORD_BOT_DECKROLL_SAMPLER_CACHE_SIZE: int = 32
+# sqlite database, in which the discord bot saves the ongoing drafts, so they survive restarts
+DISCORD_BOT_DRAFT_STORE_PATH: str = "drafts.sqlite3"
+# local port of the prometheus metrics endpoint of the discord bot (http://127.0.0.1:<port>/metrics), None disables it
+DISCORD_BOT_METRICS_PORT: Optional[int] = 9108
 SEND_DECKCODE: bool = False
 SEND_DECKLINK: bool = True
 
@@ -40,38 +52,24 @@ legacy_general_cards_and_weights_default: Dict[int, float] = {}
 for general in legacy_card_pool.generals:
     legacy_general_cards_and_weights_default[general.id] = 1.0
 
-# default - all cards have the same chance
-cards_and_weights_default: Dict[int, float] = {}
-for collectible_card in card_pool.collectible_cards:
-    cards_and_weights_default[collectible_card.id] = 1.0
+# the card weights are derived from the columnar view of the card pools
+card_factions = card_pool.collectible_card_columns["faction"]
+legacy_card_factions = legacy_card_pool.collectible_card_columns["faction"]
 
-legacy_cards_and_weights_default: Dict[int, float] = {}
-for collectible_card in legacy_card_pool.collectible_cards:
-    legacy_cards_and_weights_default[collectible_card.id] = 1.0
+# default - all cards have the same chance
+cards_and_weights_default = CardWeights(card_pool=card_pool, preset=np.ones(len(card_factions)))
+legacy_cards_and_weights_default = CardWeights(card_pool=legacy_card_pool, preset=np.ones(len(legacy_card_factions)))
 
 # adjust faction card chances in a way, that they are equally likely as neutral cards
-cards_and_weights_half_faction_half_neutral: Dict[int, int] = {}
-for collectible_card in card_pool.collectible_cards:
-    cards_and_weights_half_faction_half_neutral[collectible_card.id] = cards_per_faction["Neutral"] / cards_per_faction[collectible_card.faction]
+_, card_faction_indices, card_faction_counts = np.unique(card_factions, return_inverse=True, return_counts=True)
+cards_and_weights_half_faction_half_neutral = CardWeights(card_pool=card_pool, preset=cards_per_faction["Neutral"] / card_faction_counts[card_faction_indices])
 
-legacy_cards_and_weights_half_faction_half_neutral: Dict[int, int] = {}
-for collectible_card in legacy_card_pool.collectible_cards:
-    legacy_cards_and_weights_half_faction_half_neutral[collectible_card.id] = cards_per_faction["Neutral"] / cards_per_faction[collectible_card.faction]
+_, legacy_card_faction_indices, legacy_card_faction_counts = np.unique(legacy_card_factions, return_inverse=True, return_counts=True)
+legacy_cards_and_weights_half_faction_half_neutral = CardWeights(card_pool=legacy_card_pool, preset=legacy_cards_per_faction["Neutral"] / legacy_card_faction_counts[legacy_card_faction_indices])
 
 # exclude neutral cards
-cards_and_weights_only_faction: Dict[int, int] = {}
-for collectible_card in card_pool.collectible_cards:
-    if collectible_card.faction == "Neutral":
-        cards_and_weights_only_faction[collectible_card.id] = 0.0
-    else:
-        cards_and_weights_only_faction[collectible_card.id] = 1.0
-
-legacy_cards_and_weights_only_faction: Dict[int, int] = {}
-for collectible_card in legacy_card_pool.collectible_cards:
-    if collectible_card.faction == "Neutral":
-        legacy_cards_and_weights_only_faction[collectible_card.id] = 0.0
-    else:
-        legacy_cards_and_weights_only_faction[collectible_card.id] = 1.0
+cards_and_weights_only_faction = CardWeights(card_pool=card_pool, preset=(card_factions != NEUTRAL_FACTION_CODE).astype(np.float64))
+legacy_cards_and_weights_only_faction = CardWeights(card_pool=legacy_card_pool, preset=(legacy_card_factions != NEUTRAL_FACTION_CODE).astype(np.float64))
 
 # count chances
 count_chances_default: Dict[int, int] = {1: 20, 2: 30, 3: 50}
@@ -88,7 +86,8 @@ legacy = True
 kierans_ban_list = True
 amount_cards = 40 # amount_cards_default
 factions_and_weights = deepcopy(factions_and_weights_default)
-cards_and_weights = deepcopy(legacy_cards_and_weights_default) # deepcopy(cards_and_weights_half_faction_half_neutral)
+# the presets are read-only - dict() gives a copy, that can be changed card by card
+cards_and_weights = dict(legacy_cards_and_weights_default) # dict(cards_and_weights_half_faction_half_neutral)
 count_chances = deepcopy(count_chances_default)
 count_chances_two_remaining_deck_slots = deepcopy(count_chances_two_remaining_deck_slots_default)
 min_1_and_2_drops = 9 # min_1_and_2_drops_default
@@ -105,11 +104,11 @@ if __name__ == "__main__":
     if CREATE_DECKROLL_EXCEL:
         if legacy:
             deck_roll.roll_deck_spreadsheat(
-                amount_decks=AMOUNT_DECKS
+                amount_decks=AMOUNT_DECKS, seed=DECKROLL_EXCEL_SEED, workers=DECKROLL_EXCEL_WORKERS
             )
         else:
             deck_roll.roll_deck_spreadsheat(
-                amount_decks=AMOUNT_DECKS
+                amount_decks=AMOUNT_DECKS, seed=DECKROLL_EXCEL_SEED, workers=DECKROLL_EXCEL_WORKERS
             )
     if START_DISCORD_BOT:
         discord_bot = DiscordBot(
@@ -125,5 +124,8 @@ if __name__ == "__main__":
             count_chances_default=count_chances_default,
             count_chances_two_remaining_deck_slots_default=count_chances_two_remaining_deck_slots_default,
             min_1_and_2_drops_default=min_1_and_2_drops_default,
-            max_1_and_2_drops_default=max_1_and_2_drops_default           
+            max_1_and_2_drops_default=max_1_and_2_drops_default,
+            deckroll_sampler_cache_size=DISCORD_BOT_DECKROLL_SAMPLER_CACHE_SIZE,
+            draft_store=SQLiteDraftStore(path=DISCORD_BOT_DRAFT_STORE_PATH),
+            metrics_port=DISCORD_BOT_METRICS_PORT,
             )